@@ -0,0 +1,74 @@
+"""
+Times recursive Spoke function calls with a small and a large global namespace.
+
+Usage: python benchmarks/bench_calls.py [fib argument] [--vm]
+
+Each program is run twice, once with the fib call and once without, so the
+reported time is only the cost of the calls and not of creating the globals.
+Times are CPU time of the interpreter process, which is steadier than wall time.
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+INTERPRETER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GLOBAL_COUNTS = [10, 100000]
+RUNS = 3
+
+FIB = """let total = 0
+function fib(n) {
+    if (n << 2) then {
+        let total = total + n
+    } else {
+        let a = n - 1
+        fib(a)
+        let b = n - 2
+        fib(b)
+    }
+}
+"""
+
+def build_program(global_count, fib_n):
+    lines = [f"let g{i} = {i}" for i in range(global_count)]
+    lines.append(FIB)
+    if fib_n is not None:
+        lines.append(f"fib({fib_n})")
+        lines.append("print total")
+    return "\n".join(lines) + "\n"
+
+def child_cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def best_time(source, flags):
+    """Lowest CPU time of RUNS runs of a program through spoke.py"""
+    with tempfile.NamedTemporaryFile("w", suffix=".spk", delete=False) as f:
+        f.write(source)
+        path = f.name
+    try:
+        best = None
+        for _ in range(RUNS):
+            start = child_cpu_time()
+            subprocess.run([sys.executable, "spoke.py"] + flags + [path], cwd=INTERPRETER_DIR,
+                           stdout=subprocess.DEVNULL, check=True)
+            elapsed = child_cpu_time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+    finally:
+        os.remove(path)
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    flags = [arg for arg in sys.argv[1:] if arg.startswith("--")]
+    fib_n = int(args[0]) if args else 16
+
+    print(f"fib({fib_n}) {' '.join(flags)}".rstrip())
+    for global_count in GLOBAL_COUNTS:
+        setup = best_time(build_program(global_count, None), flags)
+        full = best_time(build_program(global_count, fib_n), flags)
+        print(f"  {global_count:>7} globals: {(full - setup) * 1000:9.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Compares running a script in a new process with running it in-process.
+
+Usage: python benchmarks/bench_inprocess.py [script.spk ...] [--runs=20]
+
+For each script (a short one of its own by default) it reports the median
+latency of running python spoke.py script.spk, the way the Spoke-Shell spk
+command did before, and of running it with a fresh Interpreter inside this
+process, the way spk does now. Output of both is thrown away.
+"""
+import io
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+INTERPRETER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, INTERPRETER_DIR)
+
+from spokeInterpreter import Interpreter
+
+SHORT_SCRIPT = """let name = "Spoke"
+print ( Hello from name )
+list items = [3, 1, 2]
+sort items
+for item in items {
+    print item
+}
+"""
+
+def subprocess_latency(path):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-u", "spoke.py", path], cwd=INTERPRETER_DIR,
+                   stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+def in_process_latency(path):
+    start = time.perf_counter()
+    Interpreter(os.path.join(INTERPRETER_DIR, "commands"), output=io.StringIO()).run_file(path)
+    return time.perf_counter() - start
+
+def main():
+    runs = 20
+    paths = []
+    for arg in sys.argv[1:]:
+        if arg.startswith("--runs="):
+            runs = int(arg.split("=", 1)[1])
+        else:
+            paths.append(os.path.abspath(arg))
+
+    temp_path = None
+    if not paths:
+        with tempfile.NamedTemporaryFile("w", suffix=".spk", delete=False) as f:
+            f.write(SHORT_SCRIPT)
+            temp_path = f.name
+        paths.append(temp_path)
+
+    try:
+        print(f"{'script':<24} {'subprocess':>12} {'in-process':>12} {'saved':>10}")
+        for path in paths:
+            # One untimed run of each fills the parse cache and the import caches
+            subprocess_latency(path)
+            in_process_latency(path)
+            separate = statistics.median(subprocess_latency(path) for _ in range(runs))
+            inside = statistics.median(in_process_latency(path) for _ in range(runs))
+            name = "(short script)" if path == temp_path else os.path.basename(path)
+            print(f"{name:<24} {separate * 1000:10.1f}ms {inside * 1000:10.1f}ms {(separate - inside) * 1000:8.1f}ms")
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+if __name__ == "__main__":
+    main()
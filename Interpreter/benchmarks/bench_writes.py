@@ -0,0 +1,77 @@
+"""
+Times writing a file line by line with save and with open / write.
+
+Usage: python benchmarks/bench_writes.py [lines] [--vm] [--transpile]
+
+Three ways of writing the same lines are compared: save opening and closing
+the file for every line (how save worked before it kept files open, forced
+here with spokeFiles.MAX_WRITERS = 0), save through its kept-open buffered
+file, and a handle from open written with write. Scripts run in-process in a
+temporary folder, the reported time is the best of RUNS runs and includes the
+final flush.
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+
+INTERPRETER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, INTERPRETER_DIR)
+
+import spokeFiles
+from spokeInterpreter import Interpreter
+
+RUNS = 3
+
+SAVE = """let i = 0
+repeat {lines} {{
+    inc i
+    save report txt ( line i \\n )
+}}
+"""
+
+WRITE = """open out report txt
+let i = 0
+repeat {lines} {{
+    inc i
+    write out ( line i )
+}}
+close out
+"""
+
+def best_time(source, flags, max_writers):
+    best = None
+    for _ in range(RUNS):
+        if os.path.exists("report.txt"):
+            os.remove("report.txt")
+        spokeFiles.MAX_WRITERS = max_writers
+        interpreter = Interpreter(os.path.join(INTERPRETER_DIR, "commands"), output=io.StringIO(),
+                                  use_vm="--vm" in flags, transpile="--transpile" in flags)
+        start = time.perf_counter()
+        interpreter.run_source(source)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    flags = [arg for arg in sys.argv[1:] if arg.startswith("--")]
+    lines = int(args[0]) if args else 20000
+    max_writers = spokeFiles.MAX_WRITERS
+
+    print(f"{lines} lines {' '.join(flags)}".rstrip())
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        cases = [
+            ("save, reopened per line", SAVE, 0),
+            ("save, kept open", SAVE, max_writers),
+            ("open / write", WRITE, max_writers),
+        ]
+        for name, program, writers in cases:
+            elapsed = best_time(program.format(lines=lines), flags, writers)
+            print(f"  {name:<24} {elapsed * 1000:9.1f} ms {lines / elapsed:12.0f} lines/s")
+        os.chdir(INTERPRETER_DIR)
+
+if __name__ == "__main__":
+    main()
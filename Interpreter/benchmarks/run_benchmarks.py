@@ -0,0 +1,129 @@
+"""
+Runs the .spk programs in benchmarks/workloads and compares them to a baseline.
+
+Usage: python benchmarks/run_benchmarks.py [workload ...] [--vm | --transpile] [--save-baseline] [--threshold=0.25]
+
+For every workload it reports the best wall time and CPU time of RUNS runs,
+the lines executed per second and the peak RSS of the interpreter process.
+The number of lines executed comes from one extra run with --profile-json.
+
+Results are compared to benchmarks/baseline.json (baseline-vm.json with --vm,
+baseline-transpile.json with --transpile).
+The exit status is 1 when any workload's CPU time is more than threshold
+(default 25%) slower than its baseline. CPU time is compared because it is
+steadier than wall time on a busy machine. --save-baseline stores the results
+as the new baseline instead. Baselines are machine specific, save one before
+comparing on a new machine.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+INTERPRETER_DIR = os.path.dirname(BENCHMARK_DIR)
+WORKLOAD_DIR = os.path.join(BENCHMARK_DIR, "workloads")
+RUNS = 5
+DEFAULT_THRESHOLD = 0.25
+
+def run_once(path, flags):
+    """Wall time and CPU time in seconds and peak RSS in KB of one run of spoke.py"""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "spoke.py"] + flags + [path], cwd=INTERPRETER_DIR,
+                               stdout=subprocess.DEVNULL)
+    # wait4 gives the resource usage of this child alone
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, process.args)
+    peak_rss = usage.ru_maxrss
+    if sys.platform == "darwin":
+        # Bytes on macOS, KB everywhere else
+        peak_rss //= 1024
+    return elapsed, usage.ru_utime + usage.ru_stime, peak_rss
+
+def lines_executed(path, flags):
+    """How many lines a workload runs, counted by the profiler"""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        profile_path = f.name
+    try:
+        subprocess.run([sys.executable, "spoke.py"] + flags + [f"--profile-json={profile_path}", path],
+                       cwd=INTERPRETER_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        with open(profile_path) as f:
+            profile = json.load(f)
+    finally:
+        os.remove(profile_path)
+    return sum(entry["hits"] for entry in profile["lines"])
+
+def measure(path, flags):
+    """Best wall and CPU time, lines per second and peak RSS of a workload"""
+    best, best_cpu, peak_rss = None, None, 0
+    for _ in range(RUNS):
+        elapsed, cpu, rss = run_once(path, flags)
+        best = elapsed if best is None else min(best, elapsed)
+        best_cpu = cpu if best_cpu is None else min(best_cpu, cpu)
+        peak_rss = max(peak_rss, rss)
+    # The VM and transpiled code don't profile lines, count them with the tree walker
+    lines = lines_executed(path, [flag for flag in flags if flag not in ("--vm", "--transpile")])
+    return {"wall": round(best, 4), "cpu": round(best_cpu, 4), "lines": lines,
+            "lines_per_sec": round(lines / best), "peak_rss_kb": peak_rss}
+
+def workload_paths(names):
+    if names:
+        return [os.path.join(WORKLOAD_DIR, name if name.endswith(".spk") else name + ".spk") for name in names]
+    return sorted(os.path.join(WORKLOAD_DIR, name) for name in os.listdir(WORKLOAD_DIR) if name.endswith(".spk"))
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = [arg for arg in sys.argv[1:] if arg.startswith("--")]
+    save = "--save-baseline" in options
+    threshold = DEFAULT_THRESHOLD
+    for option in options:
+        if option.startswith("--threshold="):
+            threshold = float(option.split("=", 1)[1])
+    # Everything else is passed on to spoke.py
+    flags = [option for option in options if option != "--save-baseline" and not option.startswith("--threshold=")]
+
+    baseline_name = "baseline.json"
+    if "--vm" in flags:
+        baseline_name = "baseline-vm.json"
+    elif "--transpile" in flags:
+        baseline_name = "baseline-transpile.json"
+    baseline_path = os.path.join(BENCHMARK_DIR, baseline_name)
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+    print(f"{'workload':<14} {'wall s':>8} {'cpu s':>8} {'lines/s':>10} {'peak RSS':>10} {'baseline':>9} {'change':>8}")
+    results = {}
+    regressions = []
+    for path in workload_paths(args):
+        name = os.path.splitext(os.path.basename(path))[0]
+        result = results[name] = measure(path, flags)
+        previous = baseline.get(name)
+        if previous:
+            change = result["cpu"] / previous["cpu"] - 1
+            compared = f"{previous['cpu']:9.3f} {change:+8.1%}"
+            if change > threshold:
+                regressions.append(name)
+                compared += "  REGRESSED"
+        else:
+            compared = f"{'-':>9} {'-':>8}"
+        print(f"{name:<14} {result['wall']:8.3f} {result['cpu']:8.3f} {result['lines_per_sec']:10.0f} {result['peak_rss_kb'] / 1024:8.1f}MB {compared}")
+
+    if save:
+        baseline.update(results)
+        with open(baseline_path, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved baseline to {os.path.relpath(baseline_path)}")
+    elif regressions:
+        print(f"{len(regressions)} workload(s) slower than baseline by more than {threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,24 @@
+from spokeTypes import SpokeSet
+
 def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
     """
-    Delete command: delete varname
-    Deletes a variable from memory
+    Delete command: delete varname OR delete mymap key / delete myset value
+    Deletes a variable from memory, or an entry from a map or set
     """
-    if len(tokens) == 2:
+    if len(tokens) == 3:
+        container = variables.get(tokens[1])
+        if not isinstance(container, (dict, SpokeSet)):
+            return False
+        key = get_val(tokens[2])
+        if key not in container:
+            print("Key not found")
+            return False
+        if isinstance(container, dict):
+            del container[key]
+        else:
+            container.remove(key)
+        return True
+    elif len(tokens) == 2:
         var_delete = tokens[1]
         if var_delete in variables:
             del variables[var_delete]
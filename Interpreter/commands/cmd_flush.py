@@ -0,0 +1,23 @@
+from spokeFiles import Writer, current_files
+
+def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """
+    Handle flush command
+    tokens format: ['flush', 'out'] or ['flush']
+    Writes out what is buffered for a file from open, or without a name for
+    every file written by open or save.
+    """
+
+    if len(tokens) == 1:
+        current_files().flush()
+        return True
+
+    if len(tokens) == 2:
+        handle = variables.get(tokens[1])
+        if not isinstance(handle, Writer):
+            print(f"Error: {tokens[1]} is not an open file")
+            return False
+        handle.flush()
+        return True
+
+    return False
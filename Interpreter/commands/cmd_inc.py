@@ -1,4 +1,4 @@
-import os
+from spokeTokens import number_value
 
 def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
     if len(tokens) != 2:
@@ -13,9 +13,8 @@ def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
         
         # Convert string numbers to actual numbers
         if isinstance(value, str):
-            if value.lstrip('-').replace('.', '').isdigit():
-                value = float(value) if '.' in value else int(value)
-            else:
+            value = number_value(value)
+            if value is None:
                 errorLine(lineNum, line)
                 return False
         
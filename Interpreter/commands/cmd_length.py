@@ -1,11 +1,15 @@
+from spokeTypes import is_collection
+
 def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
     """
     Length command: length varname loud/silent [output_var]
-    Gets the length of a variable's string representation
+    Gets the length of a variable's string representation,
+    or the number of entries in a map or set
     """
     if len(tokens) in (3, 4):
         if tokens[1] in variables:
-            length = len(str(variables[tokens[1]]))
+            value = variables[tokens[1]]
+            length = len(value) if is_collection(value) else len(str(value))
             
             if tokens[2] == "loud":
                 print(length)
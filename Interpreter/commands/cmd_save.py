@@ -1,10 +1,12 @@
-import os
+from spokeFiles import current_files
 
 # commands/cmd_save.py
 def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
     """
     Handle save command
     tokens format: ['save', 'exampleFile', 'txt', '"Hello"'] (includes command)
+    The file stays open with a buffer between saves (see spokeFiles.py), so
+    saving line after line doesn't open and close it every time.
     """
     
     if len(tokens) < 3:
@@ -53,8 +55,7 @@ def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
 
     # Write to file (always append)
     try:
-        with open(fileName, "a") as f:
-            f.write(sentence)
+        current_files().append_text(fileName, sentence)
         return True
     except Exception as e:
         return False
\ No newline at end of file
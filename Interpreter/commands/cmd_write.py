@@ -0,0 +1,45 @@
+from spokeFiles import Writer
+
+def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """
+    Handle write command
+    tokens format: ['write', 'out', '"Hello"'], ['write', 'out', 'name'] or ['write', 'out', '(', 'Hi', 'name', ')']
+    Writes the text and a line break to a file from open. The text is kept in
+    a buffer and reaches the file on flush, close or when the script ends.
+    """
+
+    if len(tokens) < 3:
+        return False
+
+    handle = variables.get(tokens[1])
+    if not isinstance(handle, Writer):
+        print(f"Error: {tokens[1]} is not an open file")
+        return False
+
+    args = tokens[2:]
+
+    # --- Parentheses form: write out ( Hello name ) ---
+    if args[0] == "(" and args[-1] == ")":
+        words = []
+        for token in args[1:-1]:
+            if (token.startswith('"') and token.endswith('"')) or (token.startswith("'") and token.endswith("'")):
+                words.append(token[1:-1])
+            elif token in variables:
+                words.append(str(variables[token]))
+            else:
+                words.append(token)
+        sentence = " ".join(words).replace('\\n', '\n')
+
+    # --- Quoted string or variable ---
+    elif len(args) == 1 and ((args[0].startswith('"') and args[0].endswith('"')) or
+                             (args[0].startswith("'") and args[0].endswith("'"))):
+        sentence = args[0][1:-1].replace('\\n', '\n')
+    elif len(args) == 1 and args[0] in variables:
+        sentence = str(variables[args[0]])
+
+    # --- Raw content ---
+    else:
+        sentence = " ".join(args).replace('\\n', '\n')
+
+    handle.write(sentence + "\n")
+    return True
@@ -0,0 +1,117 @@
+"""
+Spoke functions as every mode keeps them, and the @memo cache.
+
+    @memo maxsize=500
+    function fib(n) {
+        if (n << 2) then {
+            return n
+        }
+        return fib(n - 1) + fib(n - 2)
+    }
+    let x = fib(80)
+
+Each function is an entry in the interpreter's functions dict. entry['call']
+takes a list of arguments and returns the function's return value, so a call
+works the same whichever mode defined the function. The tree walker, the VM
+and transpiled code each pass make_function the run function that executes
+the body their way.
+
+A @memo function keeps its results keyed by its argument values, so it only
+runs once for each different set of arguments. With maxsize=N it keeps the N
+most recently used results; without it, every result.
+"""
+from collections import OrderedDict
+from functools import partial
+from spokeTypes import SpokeArray, SpokeSet
+
+class Functions(dict):
+    """An interpreter's functions dict: function name -> entry from make_function
+
+    compiled holds the let / math lines that call these functions, compiled
+    against them, so they go away with the interpreter.
+    """
+    __slots__ = ("compiled",)
+
+    def __init__(self):
+        dict.__init__(self)
+        self.compiled = {}
+
+class Memo:
+    """The cached results of one @memo function and how often they were used"""
+    __slots__ = ("maxsize", "results", "hits", "misses")
+
+    def __init__(self, maxsize):
+        # 0 keeps every result
+        self.maxsize = maxsize
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def wrap(self, call):
+        """call, answering from the cache when it has already run with the same arguments"""
+        results = self.results
+        maxsize = self.maxsize
+
+        def cached(args):
+            key = tuple(args)
+            try:
+                hit = key in results
+            except TypeError:
+                # Lists and maps are keyed by their contents
+                key = freeze(key)
+                hit = key in results
+            if hit:
+                self.hits += 1
+                if maxsize:
+                    results.move_to_end(key)
+                return results[key]
+
+            self.misses += 1
+            value = call(args)
+            results[key] = value
+            if maxsize and len(results) > maxsize:
+                results.popitem(last=False)
+            return value
+        return cached
+
+    def describe(self, name):
+        return f"{name}: {self.hits} hits, {self.misses} misses, {len(self.results)} cached"
+
+def freeze(value):
+    """A hashable stand-in for value that is equal for equal contents"""
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return ("map", frozenset((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, SpokeSet):
+        return ("set", frozenset(value))
+    if isinstance(value, SpokeArray):
+        return ("array", value.kind, tuple(value))
+    return value
+
+def make_function(node, run, **extra):
+    """The functions dict entry for a FunctionDef node
+
+    run(function, args) binds the arguments, runs the body and returns its
+    return value. extra holds what the mode keeps alongside, like the VM's code.
+    """
+    function = {'name': node.name, 'params': node.params, 'body': node.body, 'memo': None}
+    function.update(extra)
+
+    # partial adds no Python frame of its own to every call
+    call = partial(run, function)
+    if node.memo is not None:
+        function['memo'] = Memo(node.memo)
+        call = function['memo'].wrap(call)
+    function['call'] = call
+    return function
+
+def call_function(functions, name, args):
+    """Call a Spoke function from an expression, returns its return value"""
+    function = functions.get(name) if functions is not None else None
+    if function is None:
+        raise NameError(f"unknown function '{name}'")
+    if len(args) != len(function['params']):
+        count = len(function['params'])
+        raise TypeError(f"{name}() takes {count} argument{'' if count == 1 else 's'}, got {len(args)}")
+    return function['call'](args)
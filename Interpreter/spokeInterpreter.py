@@ -0,0 +1,545 @@
+"""
+The Spoke interpreter as an object that can be created and run any number of times.
+
+    from spokeInterpreter import Interpreter
+
+    interpreter = Interpreter()
+    interpreter.run_file("exampleScript.spk")
+
+Every Interpreter has its own variables, functions, loaded commands and
+output stream, and importing this module doesn't read sys.argv or touch the
+file system. spoke.py is the command line wrapper around it.
+"""
+import contextlib
+import importlib.util
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from spokeParser import Statement, FunctionDef, IfChain, WhileLoop, ForLoop, Return, parse_program
+from spokeVM import VM, compile_program
+from spokeTranspile import Runtime, transpile_program
+from spokeBuiltins import BUILTIN_COMMANDS
+from spokeProfiler import Profiler
+from spokeCache import load_program
+from spokeExpr import COMPARE_OPERATORS, compare_values, compile_expression, index_value, malformed_condition, to_number
+from spokeTypes import SpokeArray, SpokeSet, is_collection
+from spokeFunctions import Functions, make_function
+from spokeFiles import CURRENT_FILES, Files
+from spokeOutput import OutputBuffer
+from spokeTokens import INT, NAME, INDEX, LIST_LITERAL, TOKEN_TYPES, list_value, token_type
+
+# Every Spoke call is several Python calls deep, so recursive Spoke functions
+# need more room than Python's default of 1000
+RECURSION_LIMIT = 10000
+
+# The commands folder next to this file, used when no other folder is given
+DEFAULT_COMMANDS_DIR = Path(__file__).resolve().parent / "commands"
+# A command file replaces a built-in command when it starts with this line
+OVERRIDE_MARKER = "# spoke: override"
+
+class ScriptError(SystemExit):
+    """Raised by errorLine when a script stops on an error
+
+    It is a SystemExit so a command that calls errorLine still ends the program
+    when nothing catches it, the same as quit() used to.
+    """
+
+class FunctionReturn(BaseException):
+    """Raised by a return line to leave the running function with its value
+
+    Not an Exception, so the error handling around every line lets it pass
+    without an except clause of its own.
+    """
+
+    def __init__(self, value):
+        BaseException.__init__(self)
+        self.value = value
+
+class Frame(dict):
+    """Local variables of one function call, chained to the globals
+
+    Parameters live in the frame. Reads of any other name fall through to the
+    globals, and assigning to a name that is not a parameter sets the global,
+    so variables created inside a function are still visible after it returns.
+    """
+    __slots__ = ("globals",)
+
+    def __init__(self, params, globals):
+        dict.__init__(self, params)
+        self.globals = globals
+
+    def __missing__(self, key):
+        return self.globals[key]
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self.globals
+
+    def get(self, key, default=None):
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+        return self.globals.get(key, default)
+
+    def __setitem__(self, key, value):
+        if dict.__contains__(self, key):
+            dict.__setitem__(self, key, value)
+        else:
+            self.globals[key] = value
+
+    def __delitem__(self, key):
+        if dict.__contains__(self, key):
+            dict.__delitem__(self, key)
+        else:
+            del self.globals[key]
+
+def list_to_string(lst):
+    """Convert a Python list, map or set back to string representation"""
+    if isinstance(lst, dict):
+        return '{' + ','.join(f'{item_to_string(key)}:{item_to_string(value)}' for key, value in lst.items()) + '}'
+    if isinstance(lst, SpokeSet):
+        return '{' + ','.join(item_to_string(item) for item in lst) + '}'
+    if not isinstance(lst, list):
+        return str(lst)
+
+    items = []
+    for item in lst:
+        items.append(item_to_string(item))
+
+    return '[' + ','.join(items) + ']'
+
+def item_to_string(item):
+    """One item inside list_to_string, strings in quotes"""
+    if isinstance(item, str):
+        return f'"{item}"'
+    if isinstance(item, (list, dict, SpokeSet)):
+        return list_to_string(item)
+    return str(item)
+
+def ifStatementConditional(first, second, op, lineNum, line):
+    op_func = COMPARE_OPERATORS.get(op)
+    if op_func is None:
+        print(f"DEBUG: Unknown operator '{op}' on line {lineNum}")
+        return False
+    # Number tokens already arrive as numbers, only strings can still be numeric
+    if type(first) is str:
+        first = to_number(first)
+    if type(second) is str:
+        second = to_number(second)
+    return compare_values(first, second, op, op_func)
+
+def errorLine(lineNum, line):
+    print("Err on line " + str(lineNum))
+    print("Line: " + line)
+    raise ScriptError()
+
+class Interpreter:
+    """One Spoke runtime: variables, functions, loaded commands and where output goes
+
+    commands_dir is the folder cmd_<name>.py files are loaded from, output a
+    file object that replaces sys.stdout while a script runs. buffering is
+    "line", "block" or "full" (see spokeOutput.py), None picks line for a
+    terminal and block otherwise. verbose, use_vm, transpile, use_cache and
+    profile match the spoke.py flags of the same name.
+    command_registry lets interpreters share loaded commands, so a new
+    Interpreter per script doesn't import every command file again.
+    """
+
+    def __init__(self, commands_dir=None, output=None, verbose=False, use_vm=False, use_cache=True, profile=False,
+                 command_registry=None, transpile=False, buffering=None):
+        self.commands_dir = Path(commands_dir) if commands_dir is not None else DEFAULT_COMMANDS_DIR
+        self.output = output
+        self.buffering = buffering
+        self.verbose = verbose
+        self.use_vm = use_vm
+        self.transpile = transpile
+        self.use_cache = use_cache
+
+        self.variables = {}
+        self.functions = Functions()
+        # Line indexes for read and files kept open by save and open, see spokeFiles.py
+        self.files = Files()
+        self.lineNum = 0
+        # Scopes of the running function calls, the globals are always at the bottom
+        self.call_stack = [self.variables]
+
+        # Loaded commands: name -> (file mtime, run function)
+        # Each cmd_<name>.py is only executed again when its file changes on disk
+        self.command_registry = command_registry if command_registry is not None else {}
+        self.command_stats = {"loads": 0, "hits": 0, "load_time": 0.0}
+        # Built-in command name -> whether commands/cmd_<name>.py overrides it, checked once
+        self.builtin_overrides = {}
+        # How often each command ran from BUILTIN_COMMANDS and from the commands folder
+        self.builtin_calls = Counter()
+        self.module_calls = Counter()
+        # Branch / WhileLoop node -> compiled condition, Return node -> compiled value
+        self.compiled_expressions = {}
+
+        self.profiler = self.start_profiler() if profile else None
+
+    def run_file(self, filename):
+        """Run a .spk file, returns False if it stopped on an error"""
+        with open(filename, "r") as file:
+            source = file.read()
+        return self.run_source(source, filename)
+
+    def run_source(self, source, filename=None):
+        """Run Spoke source code, returns False if it stopped on an error
+
+        Variables and functions are kept between runs, use a new Interpreter
+        for a fresh start. filename is only used for the parse cache.
+        """
+        return self.run_program(self.parse(source, filename))
+
+    def parse(self, source, filename=None):
+        """Parse source, through the cache in __spokecache__ when filename is given"""
+        if filename is not None and self.use_cache:
+            return load_program(filename, source, self.verbose)
+        return parse_program(source)
+
+    def run_program(self, program):
+        """Run parsed statement nodes, returns False if they stopped on an error"""
+        # Raised here rather than in spoke.py, so the shell's spk and serve workers get it too
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), RECURSION_LIMIT))
+        output = OutputBuffer(self.output if self.output is not None else sys.stdout, self.buffering)
+        files = CURRENT_FILES.set(self.files)
+        with contextlib.redirect_stdout(output):
+            try:
+                if self.use_vm:
+                    self.make_vm().run(compile_program(program, self.is_overridden))
+                elif self.transpile:
+                    self.make_runtime().run(transpile_program(program, is_overridden=self.is_overridden))
+                else:
+                    self.execute_nodes(program)
+            except ScriptError:
+                return False
+            except (SystemExit, FunctionReturn):
+                # The quit command, or return outside a function
+                pass
+            finally:
+                # Files from save and open keep a buffer, write it out even after an
+                # error. The next run opens them afresh
+                self.files.close()
+                CURRENT_FILES.reset(files)
+                output.flush()
+        return True
+
+    def make_vm(self):
+        vm = VM(self.call_stack, self.functions, self.get_val, errorLine, self.run_command,
+                self.condition_holds, ifStatementConditional, Frame, self.loop_values)
+        if self.profiler:
+            # The VM doesn't run line by line, only its calls and commands are timed
+            vm.run_function = self.profiler.functions.wrap(vm.run_function, lambda function, args: (function['name'], function['name']))
+        return vm
+
+    def make_runtime(self):
+        """What transpiled programs run against, see spokeTranspile.py"""
+        return Runtime(self.call_stack, self.functions, self.get_val, errorLine, self.run_command, self.find_command,
+                       self.loop_values, Frame, self.profiler)
+
+    def load_command(self, command_name):
+        """Load a command from the commands folder, reusing the cached run function"""
+        command_path = self.commands_dir / f"cmd_{command_name}.py"
+
+        try:
+            mtime = command_path.stat().st_mtime_ns
+        except OSError:
+            self.command_registry.pop(command_name, None)
+            return None
+
+        cached = self.command_registry.get(command_name)
+        if cached and cached[0] == mtime:
+            self.command_stats["hits"] += 1
+            return cached[1]
+
+        try:
+            start = time.perf_counter()
+            spec = importlib.util.spec_from_file_location(f"spoke_commands.{command_name}", command_path)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[f"spoke_commands.{command_name}"] = module
+            spec.loader.exec_module(module)
+            self.command_stats["loads"] += 1
+            self.command_stats["load_time"] += time.perf_counter() - start
+
+            if hasattr(module, "run"):
+                self.command_registry[command_name] = (mtime, module.run)
+                return module.run
+            else:
+                print(f"Error: cmd_{command_name}.py missing 'run' function")
+                return None
+        except Exception as e:
+            print(f"Error loading command {command_name}: {e}")
+            return None
+
+    def preload_commands(self):
+        """Load every command file in the commands folder ahead of time"""
+        for command_path in sorted(self.commands_dir.glob("cmd_*.py")):
+            self.load_command(command_path.stem[len("cmd_"):])
+
+    def parse_list(self, list_str):
+        """Parse a list string like '[1,2,3]' or '["a",["b","c"]]' into a Python list, see spokeTokens.py"""
+        return list_value(list_str, self.call_stack[-1])
+
+    def get_val(self, token):
+        """The value a command's operand token stands for
+
+        What kind of token it is, and the number or string it holds, is only
+        worked out the first time (see spokeTokens.py).
+        """
+        variables = self.call_stack[-1]
+        kind, value = TOKEN_TYPES.get(token) or token_type(token)
+        if kind is NAME:
+            # A name that isn't a variable stands for itself
+            return variables.get(token, token)
+        if kind is INDEX:
+            return self.index_token(variables, token, *value)
+        if kind is LIST_LITERAL:
+            return self.parse_list(token)
+        # INT, FLOAT and STRING hold their value already
+        return value
+
+    def index_token(self, variables, token, name, index):
+        """get_val of name[index]: a list or array item by position, a slice or a map lookup"""
+        container = variables.get(name)
+        if isinstance(container, (list, SpokeArray)):
+            if ":" in index:
+                return self.slice_token(container, index)
+            kind, position = token_type(index)
+            if kind is not INT:
+                if index not in variables:
+                    return token
+                position = variables[index]
+                if not isinstance(position, int):
+                    return None
+            if -len(container) <= position < len(container):
+                return container[position]
+            return None  # Index out of bounds
+        if isinstance(container, dict):
+            # Map lookup like: ages["ann"] or ages[name]
+            try:
+                return index_value(container, self.get_val(index))
+            except TypeError:
+                return None
+        return token
+
+    def slice_token(self, container, index):
+        """container[start:stop] for the index of name[start:stop], None if a bound isn't a whole number"""
+        bounds = [self.get_val(part.strip()) if part.strip() else None for part in index.split(":")]
+        if len(bounds) > 3 or not all(bound is None or type(bound) is int for bound in bounds):
+            return None
+        if len(bounds) == 3 and bounds[2] == 0:
+            return None
+        return container[slice(*bounds)]
+
+    def compile_condition(self, tree, lineNum, line):
+        """Turn a condition tree from spokeParser.parse_test into a function of the current variables"""
+        if tree is None:
+            # Warned about and counted as false, like a comparison that can't be made
+            def malformed(variables):
+                return malformed_condition(lineNum)
+            return malformed
+        return compile_expression(tree, self.functions)
+
+    def condition_holds(self, node):
+        """Evaluate the condition of an if branch or while loop, compiling it on first use"""
+        test = self.compiled_expressions.get(node)
+        if test is None:
+            test = self.compiled_expressions[node] = self.compile_condition(node.test, node.lineno, node.line)
+        return test(self.call_stack[-1])
+
+    def return_value(self, node):
+        """Evaluate the value of a return line, compiling it on first use"""
+        evaluate = self.compiled_expressions.get(node)
+        if evaluate is None:
+            evaluate = self.compiled_expressions[node] = compile_expression(node.value, self.functions)
+        return evaluate(self.call_stack[-1])
+
+    def call_function(self, node, command):
+        """Run a Spoke function for a name(args) line"""
+        function = self.functions[command]
+        if node.call_args is None:
+            errorLine(node.lineno, node.line)
+
+        args = [self.get_val(token) for token in node.call_args]
+        if len(args) != len(function['params']):
+            errorLine(node.lineno, node.line)
+        if function['memo'] is not None or not function.get('inline'):
+            function['call'](args)
+            return
+
+        # The value is thrown away, so the body runs right here, without
+        # going through function['call'] and run_function
+        call_stack = self.call_stack
+        call_stack.append(Frame(zip(function['params'], args), self.variables))
+        try:
+            self.execute_nodes(function['body'])
+        except FunctionReturn:
+            pass
+        finally:
+            call_stack.pop()
+
+    def run_function(self, function, args):
+        """Run the body of a function defined by the tree walker, returns its return value"""
+        call_stack = self.call_stack
+        call_stack.append(Frame(zip(function['params'], args), self.variables))
+        try:
+            self.execute_nodes(function['body'])
+        except FunctionReturn as returned:
+            return returned.value
+        finally:
+            call_stack.pop()
+        return None
+
+    def run_if_chain(self, chain):
+        """Run the first branch of an if / else if / else chain whose condition holds"""
+        for branch in chain.branches:
+            if branch.condition is None or self.condition_holds(branch):
+                self.execute_nodes(branch.body)
+                return
+
+    def run_command(self, node):
+        """Load and execute the modular command for a statement"""
+        command = node.tokens[0]
+        command_func = self.find_command(command)
+        if command_func:
+            try:
+                success = command_func(list(node.tokens), self.call_stack[-1], self.functions, self.get_val, errorLine, node.lineno, node.line)
+                if not success:
+                    errorLine(node.lineno, node.line)
+            except Exception as e:
+                print(f"Error executing command {command}: {e}")
+                errorLine(node.lineno, node.line)
+        else:
+            print(f"DEBUG: Unknown command '{command}' on line {node.lineno}")
+            errorLine(node.lineno, node.line)
+
+    def loop_values(self, node):
+        """The values a for / repeat / foreach loop runs over"""
+        if node.file is not None:
+            try:
+                return self.files.stream_lines(self.get_val(node.file))
+            except OSError as e:
+                print(f"Error: Could not read {node.file}: {e.strerror}")
+                errorLine(node.lineno, node.line)
+        if node.range_args is not None:
+            bounds = [self.get_val(token) for token in node.range_args]
+            if not 1 <= len(bounds) <= 3 or not all(isinstance(bound, int) for bound in bounds):
+                errorLine(node.lineno, node.line)
+            return range(*bounds)
+
+        values = self.get_val(node.source)
+        if not isinstance(values, (list, str, SpokeArray)) and not is_collection(values):
+            errorLine(node.lineno, node.line)
+        # Loop over a copy so changing the list inside the loop doesn't change the loop,
+        # maps give their keys
+        return list(values)
+
+    def execute_nodes(self, nodes):
+        """Run a list of parsed statement nodes"""
+        functions = self.functions
+        run_command = self.run_command
+
+        for node in nodes:
+            self.lineNum = node.lineno
+            line = node.line
+
+            try:
+                node_type = type(node)
+
+                if node_type is Statement:
+                    if node.tokens[0] in functions:
+                        self.call_function(node, node.tokens[0])
+                    else:
+                        run_command(node)
+
+                elif node_type is IfChain:
+                    self.run_if_chain(node)
+
+                elif node_type is WhileLoop:
+                    condition_holds = self.condition_holds
+                    while condition_holds(node):
+                        self.execute_nodes(node.body)
+
+                elif node_type is ForLoop:
+                    if node.var is None:
+                        for _ in self.loop_values(node):
+                            self.execute_nodes(node.body)
+                    else:
+                        for value in self.loop_values(node):
+                            self.call_stack[-1][node.var] = value
+                            self.execute_nodes(node.body)
+
+                elif node_type is Return:
+                    raise FunctionReturn(self.return_value(node))
+
+                elif node_type is FunctionDef:
+                    # Profiled calls have to go through the timed run_function
+                    functions[node.name] = make_function(node, self.run_function, inline=self.profiler is None)
+
+            except Exception as e:
+                print(f"DEBUG: Unexpected error on line {self.lineNum}: {e}")
+                errorLine(self.lineNum, line)
+
+    def start_profiler(self):
+        """Time every line, function call and command from now on
+
+        Swaps in timed versions of execute_nodes, run_command and run_function
+        on this interpreter, so runs without profiling don't pay anything for it.
+        """
+        profiler = Profiler()
+        lines = profiler.lines
+        run_nodes = self.execute_nodes
+
+        def profiled_execute_nodes(nodes):
+            for node in nodes:
+                lines.enter(node.lineno, f"line {node.lineno}: {node.line}")
+                try:
+                    run_nodes((node,))
+                finally:
+                    lines.exit()
+
+        self.execute_nodes = profiled_execute_nodes
+        self.run_command = profiler.commands.wrap(self.run_command, lambda node: (node.tokens[0], node.tokens[0]))
+        self.run_function = profiler.functions.wrap(self.run_function, lambda function, args: (function['name'], function['name']))
+        return profiler
+
+    def is_overridden(self, command_name):
+        """Whether commands/cmd_<name>.py asks to replace the built-in command"""
+        overridden = self.builtin_overrides.get(command_name)
+        if overridden is None:
+            try:
+                with open(self.commands_dir / f"cmd_{command_name}.py", "r") as f:
+                    overridden = f.readline().strip() == OVERRIDE_MARKER
+            except OSError:
+                overridden = False
+            self.builtin_overrides[command_name] = overridden
+        return overridden
+
+    def find_command(self, command_name):
+        """The run function for a command, built in unless the commands folder overrides it"""
+        builtin = BUILTIN_COMMANDS.get(command_name)
+        if builtin is not None and not self.is_overridden(command_name):
+            self.builtin_calls[command_name] += 1
+            return builtin
+
+        command_func = self.load_command(command_name)
+        if command_func:
+            self.module_calls[command_name] += 1
+        return command_func
+
+    def print_command_stats(self, file=None):
+        """Report how often commands were imported versus served from the registry"""
+        file = file or sys.stderr
+        stats = self.command_stats
+        print(f"Commands: {stats['loads']} loaded in {stats['load_time'] * 1000:.2f} ms, "
+              f"{stats['hits']} cached lookups", file=file)
+        for name, count in sorted(self.builtin_calls.items()):
+            print(f"  {name}: {count} built in", file=file)
+        for name, count in sorted(self.module_calls.items()):
+            print(f"  {name}: {count} from cmd_{name}.py", file=file)
+
+    def print_memo_stats(self, file=None):
+        """Report how well the cache of each @memo function did"""
+        file = file or sys.stderr
+        for name, function in sorted(self.functions.items()):
+            if function['memo'] is not None:
+                print(f"Memo {function['memo'].describe(name)}", file=file)
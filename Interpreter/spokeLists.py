@@ -0,0 +1,73 @@
+"""
+Commands that work on a whole list at once.
+
+    range 1000000 xs        xs = [0, 1, ..., 999999]
+    map xs * 2              every item doubled, in place
+    filter xs >> 10 big     the items over 10, into big
+    sum xs total
+
+Each one hands the whole list to a Python builtin (range, sum, min, max, map,
+itertools.compress, functools.reduce, dict.fromkeys, zip), so the loop over
+the items runs in C instead of running one Spoke line per item.
+
+map and reduce use the same operators as expressions, filter compares the
+way an if condition does, numeric strings compare as numbers. They all take
+an array as well as a list, and give back an array for an array.
+"""
+import functools
+from itertools import compress, repeat
+from spokeExpr import BINARY_OPERATORS, COMPARE_OPERATORS, EXPRESSION_FUNCTIONS, compare_values, to_number
+from spokeTypes import SpokeArray
+
+# Functions map can apply to every item on their own: map xs abs
+ITEM_FUNCTIONS = {name: EXPRESSION_FUNCTIONS[name]
+                  for name in ("sqrt", "abs", "round", "floor", "ceil", "int", "float", "str", "len")}
+
+def map_items(items, op, operand=None):
+    """A new list of item op operand for every item, or op(item) for an ITEM_FUNCTIONS name"""
+    if isinstance(items, SpokeArray):
+        if op in ITEM_FUNCTIONS:
+            return SpokeArray(map(ITEM_FUNCTIONS[op], items))
+        return BINARY_OPERATORS[op](items, operand)
+    if op in ITEM_FUNCTIONS:
+        return list(map(ITEM_FUNCTIONS[op], items))
+    return list(map(BINARY_OPERATORS[op], items, repeat(operand)))
+
+def filter_items(items, op, operand):
+    """A new list of the items for which item op operand holds"""
+    op_func = COMPARE_OPERATORS[op]
+    operand = to_number(operand)
+    if isinstance(items, SpokeArray):
+        if type(operand) is int or type(operand) is float:
+            return items.select(op_func, operand)
+        return SpokeArray(filter_items(items.tolist(), op, operand), items.kind)
+    # Without strings to turn into numbers the whole comparison runs in C
+    if type(operand) is not str and str not in set(map(type, items)):
+        try:
+            return list(compress(items, map(op_func, items, repeat(operand))))
+        except TypeError:
+            # Some items can't be ordered against operand
+            pass
+    return [item for item in items if compare_values(to_number(item), operand, op, op_func)]
+
+def reduce_items(items, op):
+    """items[0] op items[1] op ... for a list with at least one item"""
+    return functools.reduce(BINARY_OPERATORS[op], items)
+
+def unique_items(items):
+    """A new list of items without repeats, each kept where it first appears"""
+    if isinstance(items, SpokeArray):
+        return SpokeArray(dict.fromkeys(items), items.kind)
+    try:
+        return list(dict.fromkeys(items))
+    except TypeError:
+        # Lists inside the list can't be dict keys
+        unique = []
+        for item in items:
+            if item not in unique:
+                unique.append(item)
+        return unique
+
+def zip_items(first, second):
+    """[[first[0], second[0]], [first[1], second[1]], ...] as long as the shorter list"""
+    return list(map(list, zip(first, second)))
@@ -0,0 +1,78 @@
+"""
+How much of a running script's output is held back before it is written.
+
+    python spoke.py --buffer=block script.spk
+
+Commands print with Python's print, and when Python runs with -u, as the
+editor and spk --subprocess start spoke.py, every print is its own write to
+the terminal or pipe. While a script runs, sys.stdout is an OutputBuffer that
+collects the text and hands it on in larger pieces:
+
+    line    at the end of every line, so a terminal shows each line as it's printed
+    block   once BLOCK_SIZE characters are waiting
+    full    only when the script ends
+
+The default is line when the output is a terminal and block otherwise.
+Whatever the mode, what is waiting is written out before input and pause
+wait for the user, before sleep, countdown and clear, and when the script
+ends, also when it stops on an error.
+"""
+
+BUFFERING_MODES = ("line", "block", "full")
+# Characters collected in block mode before they are written out
+BLOCK_SIZE = 1 << 16
+
+class OutputBuffer:
+    """Stands in for stdout while a script runs, passing its text on to target
+
+    Anything else asked of it, like fileno or encoding, is answered by target,
+    so input still sees the terminal.
+    """
+
+    def __init__(self, target, mode=None):
+        self.target = target
+        self.mode = mode or default_mode(target)
+        self.parts = []
+        self.size = 0
+        # One write method per mode, so writing doesn't check the mode every time
+        self.write = getattr(self, f"write_{self.mode}")
+
+    def write_line(self, text):
+        self.parts.append(text)
+        if "\n" in text:
+            self.flush()
+        return len(text)
+
+    def write_block(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= BLOCK_SIZE:
+            self.flush()
+        return len(text)
+
+    def write_full(self, text):
+        self.parts.append(text)
+        return len(text)
+
+    def flush(self):
+        if self.parts:
+            text = "".join(self.parts)
+            self.parts.clear()
+            self.size = 0
+            self.target.write(text)
+        self.target.flush()
+
+    def isatty(self):
+        return is_terminal(self.target)
+
+    def __getattr__(self, name):
+        return getattr(self.target, name)
+
+def is_terminal(stream):
+    try:
+        return stream.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+def default_mode(target):
+    return "line" if is_terminal(target) else "block"
@@ -0,0 +1,98 @@
+"""
+Line, function and command profiler for spoke.py --profile.
+
+spoke.py only routes execution through a Profiler when the flag is given,
+a normal run never touches this module.
+"""
+import json
+import sys
+import time
+
+class ProfileTable:
+    """Hit counts and timings for one kind of entry: lines, functions or commands"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        # key -> [label, hits, cumulative seconds, self seconds]
+        self.entries = {}
+        # [key, start time, time spent in nested entries] for every running entry
+        self.stack = []
+        # How many times each key is on the stack, recursive calls only add cumulative time once
+        self.depth = {}
+
+    def enter(self, key, label):
+        if key not in self.entries:
+            self.entries[key] = [label, 0, 0.0, 0.0]
+            self.depth[key] = 0
+        self.depth[key] += 1
+        self.stack.append([key, time.perf_counter(), 0.0])
+
+    def exit(self):
+        key, start, nested = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        entry = self.entries[key]
+        entry[1] += 1
+        entry[3] += elapsed - nested
+        self.depth[key] -= 1
+        if not self.depth[key]:
+            entry[2] += elapsed
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+    def finish(self):
+        """Close entries that were still running when the program stopped"""
+        while self.stack:
+            self.exit()
+
+    def wrap(self, func, describe):
+        """func, timed under the (key, label) describe returns for its arguments"""
+        def profiled(*args):
+            self.enter(*describe(*args))
+            try:
+                return func(*args)
+            finally:
+                self.exit()
+        return profiled
+
+    def rows(self):
+        """Entries sorted by self time, slowest first"""
+        return sorted(self.entries.values(), key=lambda entry: entry[3], reverse=True)
+
+class Profiler:
+    """The tables for one profiled run"""
+
+    def __init__(self):
+        self.lines = ProfileTable("lines")
+        self.functions = ProfileTable("functions")
+        self.commands = ProfileTable("commands")
+        self.tables = (self.lines, self.functions, self.commands)
+
+    def finish(self):
+        for table in self.tables:
+            table.finish()
+
+    def report(self, file=None, limit=20):
+        """Print the slowest entries of every table"""
+        file = file or sys.stderr
+        print("\nProfile (times in ms, sorted by self time):", file=file)
+        for table in self.tables:
+            rows = table.rows()
+            if not rows:
+                continue
+            print(f"\n{table.kind}:", file=file)
+            print(f"{'hits':>10} {'cumulative':>12} {'self':>12} {'per hit':>10}  {table.kind[:-1]}", file=file)
+            for label, hits, cumulative, own in rows[:limit]:
+                print(f"{hits:>10} {cumulative * 1000:>12.3f} {own * 1000:>12.3f} {own * 1000 / hits:>10.4f}  {label}", file=file)
+            if len(rows) > limit:
+                print(f"{'':>10} ... {len(rows) - limit} more", file=file)
+
+    def write_json(self, path):
+        """Write every entry to path as JSON"""
+        data = {}
+        for table in self.tables:
+            data[table.kind] = [
+                {"name": label, "hits": hits, "cumulative": cumulative, "self": own}
+                for label, hits, cumulative, own in table.rows()
+            ]
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
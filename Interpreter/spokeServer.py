@@ -0,0 +1,325 @@
+"""
+A pool of warm Spoke worker processes that run jobs sent by spokeClient.py.
+
+    python spoke.py serve [--workers=4] [--socket=PATH | --port=PORT] [--timeout=SECONDS]
+
+Every worker imports the interpreter and all command files once when it starts,
+then runs jobs one at a time, each with a fresh Interpreter. A job is a script
+path or its source (- reads it from stdin), the client's working directory,
+which the job runs in, and optional text for input commands to read. Its
+output is streamed back to the client while it runs.
+
+The socket and a token file live in a directory only the server's user can
+open (see spokeClient.runtime_dir). A request without the token is refused,
+which matters most with --port, where any local user can connect.
+
+Client and server talk in JSON, one object per line. The client sends the
+job, the server answers with {"output": text} objects and finishes with
+{"done": true, "ok": ..., "timed_out": ..., "elapsed": ...}. {"stats": true}
+asks for the server's throughput stats instead.
+
+A job that runs past its timeout has its worker killed and replaced.
+"""
+import hmac
+import io
+import json
+import multiprocessing
+import os
+import queue
+import secrets
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+from pathlib import Path
+from spokeClient import DEFAULT_PORT, default_socket, parse_options, runtime_dir, token_path, uses_tcp
+
+DEFAULT_WORKERS = 4
+# Seconds a job may run when neither the job nor the server sets a timeout
+DEFAULT_TIMEOUT = 60
+
+class PipeWriter(io.TextIOBase):
+    """Stands in for stdout in a worker, sending every finished line to the server"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.buffer = []
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self.buffer.append(text)
+        if "\n" in text:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if self.buffer:
+            self.conn.send(("output", "".join(self.buffer)))
+            self.buffer = []
+
+def worker_main(conn, commands_dir):
+    """Body of a worker process: load every command, then run jobs until told to stop"""
+    from spokeInterpreter import Interpreter
+
+    registry = {}
+    Interpreter(commands_dir, command_registry=registry).preload_commands()
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        conn.send(("done", run_job(Interpreter, job, conn, commands_dir, registry)))
+
+def run_job(interpreter_type, job, conn, commands_dir, registry):
+    """Run one job with a fresh interpreter, returns whether it finished without an error"""
+    output = PipeWriter(conn)
+    # Line by line, so the client sees output as it comes and a job that times out keeps what it printed
+    interpreter = interpreter_type(commands_dir, output=output, command_registry=registry, buffering="line")
+    stdin = sys.stdin
+    sys.stdin = io.StringIO(job.get("input") or "")
+    cwd = os.getcwd()
+    try:
+        if job.get("cwd"):
+            os.chdir(job["cwd"])
+        if job.get("path"):
+            return interpreter.run_file(job["path"])
+        return interpreter.run_source(job.get("source", ""))
+    except Exception as e:
+        output.write(f"Error: Could not run program: {e}\n")
+        return False
+    finally:
+        os.chdir(cwd)
+        sys.stdin = stdin
+        output.flush()
+
+class Worker:
+    """A worker process and the pipe to it"""
+
+    def __init__(self, commands_dir):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=worker_main, args=(child_conn, commands_dir), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def wait_ready(self):
+        self.conn.recv()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+class WorkerPool:
+    """Hands each job to an idle worker and keeps count of how jobs went"""
+
+    def __init__(self, size, commands_dir, timeout=DEFAULT_TIMEOUT):
+        self.size = size
+        self.commands_dir = commands_dir
+        self.timeout = timeout
+        self.workers = [Worker(commands_dir) for _ in range(size)]
+        self.idle = queue.Queue()
+        for worker in self.workers:
+            worker.wait_ready()
+            self.idle.put(worker)
+
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.stats = {"jobs": 0, "ok": 0, "failed": 0, "timed_out": 0, "job_time": 0.0}
+
+    def replace(self, worker):
+        """Kill a worker that is stuck or broken and start a new one in its place"""
+        worker.kill()
+        new_worker = Worker(self.commands_dir)
+        new_worker.wait_ready()
+        with self.lock:
+            self.workers[self.workers.index(worker)] = new_worker
+        return new_worker
+
+    def run(self, job, send):
+        """Run a job, passing each piece of output to send, returns the final result"""
+        timeout = job.get("timeout") or self.timeout
+        worker = self.idle.get()
+        start = time.perf_counter()
+        result = {"done": True, "ok": False, "timed_out": False}
+        try:
+            worker.conn.send(job)
+            deadline = start + timeout
+            while True:
+                if not worker.conn.poll(max(0, deadline - time.perf_counter())):
+                    result["timed_out"] = True
+                    worker = self.replace(worker)
+                    break
+                kind, value = worker.conn.recv()
+                if kind == "done":
+                    result["ok"] = value
+                    break
+                if send is not None:
+                    try:
+                        send({"output": value})
+                    except OSError:
+                        # The client went away, keep reading until the worker is done
+                        send = None
+        except (EOFError, OSError) as e:
+            result["error"] = f"worker failed: {e}"
+            worker = self.replace(worker)
+        finally:
+            self.idle.put(worker)
+
+        result["elapsed"] = time.perf_counter() - start
+        with self.lock:
+            self.stats["jobs"] += 1
+            self.stats["job_time"] += result["elapsed"]
+            if result["timed_out"]:
+                self.stats["timed_out"] += 1
+            elif result["ok"]:
+                self.stats["ok"] += 1
+            else:
+                self.stats["failed"] += 1
+        return result
+
+    def report(self):
+        """Throughput stats since the server started"""
+        with self.lock:
+            stats = dict(self.stats)
+        uptime = time.time() - self.started
+        stats["workers"] = self.size
+        stats["uptime"] = uptime
+        stats["jobs_per_sec"] = stats["jobs"] / uptime if uptime else 0.0
+        stats["mean_job_ms"] = stats["job_time"] * 1000 / stats["jobs"] if stats["jobs"] else 0.0
+        return stats
+
+    def close(self):
+        for worker in self.workers:
+            worker.stop()
+
+class JobHandler(socketserver.StreamRequestHandler):
+    """One client connection: a single job or stats request"""
+
+    def send(self, message):
+        self.wfile.write(json.dumps(message).encode() + b"\n")
+        self.wfile.flush()
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            # Connected and hung up, like serve checking for a running server
+            return
+        try:
+            request = json.loads(line)
+        except ValueError:
+            self.send({"done": True, "ok": False, "error": "bad request"})
+            return
+        if not hmac.compare_digest(str(request.pop("token", None) or ""), self.server.token):
+            self.send({"done": True, "ok": False, "error": "wrong token, the server only takes jobs from its own user"})
+            return
+        try:
+            if request.get("stats"):
+                self.send(self.server.pool.report())
+            else:
+                self.send(self.server.pool.run(request, self.send))
+        except OSError:
+            # The client hung up before the job finished
+            pass
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class UnixJobServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+class TCPJobServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def make_runtime_dir():
+    """Create runtime_dir() readable only by this user, returns an error message if it isn't"""
+    path = runtime_dir()
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.stat(path)
+    if hasattr(os, "getuid") and (info.st_uid != os.getuid() or info.st_mode & 0o077):
+        return f"{path} must belong to you and be closed to other users (chmod 700)"
+    return None
+
+def load_token():
+    """The token clients must send, made on the first start and kept readable only by this user"""
+    try:
+        fd = os.open(token_path(), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(token_path(), "r") as f:
+            return f.read().strip()
+    with os.fdopen(fd, "w") as f:
+        token = secrets.token_hex(32)
+        f.write(token)
+    return token
+
+def clear_socket(address):
+    """Remove a socket left behind by a server that has stopped, returns an error message if it can't"""
+    if not os.path.lexists(address):
+        return None
+    if not stat.S_ISSOCK(os.lstat(address).st_mode):
+        return f"{address} is not a socket, not replacing it"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(address)
+        except OSError:
+            os.remove(address)
+            return None
+    return f"a server is already running on {address}"
+
+def serve(argv):
+    """python spoke.py serve, returns the exit status"""
+    options, _ = parse_options(argv)
+    workers = int(options.get("workers") or DEFAULT_WORKERS)
+    timeout = float(options.get("timeout") or DEFAULT_TIMEOUT)
+    commands_dir = Path(options.get("commands") or "commands").resolve()
+
+    address = None if uses_tcp(options) else options.get("socket") or default_socket()
+    error = make_runtime_dir() or (address and clear_socket(address))
+    if error:
+        print(f"Error: {error}")
+        return 1
+    token = load_token()
+
+    pool = WorkerPool(workers, commands_dir, timeout)
+    if address is None:
+        port = int(options.get("port") or DEFAULT_PORT)
+        server = TCPJobServer(("127.0.0.1", port), JobHandler)
+        address = f"127.0.0.1:{port}"
+        socket_id = None
+    else:
+        server = UnixJobServer(address, JobHandler)
+        socket_id = os.stat(address).st_ino
+    server.pool = pool
+    server.token = token
+
+    print(f"Spoke server: {workers} workers on {address}, stop with Ctrl+C")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.close()
+        # Only our own socket, another server may have taken the path since
+        if socket_id is not None and os.path.lexists(address) and os.stat(address).st_ino == socket_id:
+            os.remove(address)
+        stats = pool.report()
+        print(f"\nRan {stats['jobs']} jobs ({stats['ok']} ok, {stats['failed']} failed, {stats['timed_out']} timed out), "
+              f"{stats['jobs_per_sec']:.2f} jobs/s")
+    return 0
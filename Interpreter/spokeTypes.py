@@ -0,0 +1,286 @@
+"""
+Spoke's collection types besides the list.
+
+A map is a plain dict. A set is a SpokeSet, which keeps its values as the
+keys of a dict, so it has the dict's O(1) lookups and remembers the order
+values were added in, which keeps printing a set the same from run to run.
+
+An array is a SpokeArray, a list of numbers of one kind, int64 or float64.
+A list keeps every number as its own Python object, an array keeps just the
+8 bytes of each one in a single block: a NumPy ndarray when NumPy is
+installed, an array.array otherwise. Arithmetic on a whole array, sorting,
+sum, min and max run over that block in C, and an array only turns into a
+list when something asks for one.
+
+An int array item that doesn't fit in 64 bits raises OverflowError with
+the same message from either backend. NumPy would wrap around instead, so
+when the biggest items show a result could go past the limit it is worked
+out with Python ints first.
+"""
+import operator
+from array import array
+from itertools import compress, repeat
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class SpokeSet:
+    """A set of values, in the order they were first added"""
+    __slots__ = ("items",)
+
+    def __init__(self, values=()):
+        self.items = dict.fromkeys(values)
+
+    def add(self, value):
+        self.items[value] = None
+
+    def remove(self, value):
+        del self.items[value]
+
+    def __contains__(self, value):
+        return value in self.items
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __eq__(self, other):
+        return isinstance(other, SpokeSet) and self.items.keys() == other.items.keys()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "{" + ", ".join(repr(value) for value in self.items) + "}"
+
+def is_collection(value):
+    """Maps and sets, the values get / put / has / keys work on besides lists"""
+    return isinstance(value, (dict, SpokeSet))
+
+def make_set(value):
+    """The set an expression on the right of set name = ... stands for, None if it can't be one"""
+    if isinstance(value, SpokeSet):
+        return value
+    if isinstance(value, list):
+        return SpokeSet(value)
+    if isinstance(value, dict) and not value:
+        # {} on its own is an empty map
+        return SpokeSet()
+    return None
+
+# Kinds of array -> (array.array typecode, NumPy dtype)
+ARRAY_KINDS = {"int": ("q", "int64"), "float": ("d", "float64")}
+# Arrays keep their numbers in NumPy when it is installed
+USE_NUMPY = numpy is not None
+# What an int array can hold
+INT_MIN, INT_MAX = -1 << 63, (1 << 63) - 1
+INT_OVERFLOW = "an int array item must fit in 64 bits"
+
+def typed_array(typecode, values):
+    """array(typecode, values), with the same OverflowError as the NumPy backend"""
+    try:
+        return array(typecode, values)
+    except OverflowError:
+        raise OverflowError(INT_OVERFLOW) from None
+
+def int_ndarray(values):
+    """An int64 ndarray of values, which may be Python ints of any size"""
+    try:
+        return numpy.array(values, dtype="int64")
+    except OverflowError:
+        raise OverflowError(INT_OVERFLOW) from None
+
+def array_kind(values, kind=None):
+    """The kind of array values make, kind if given and they fit it"""
+    types = set(map(type, values))
+    if not types <= {int, float}:
+        raise TypeError("an array can only hold numbers")
+    if kind is None:
+        return "float" if float in types else "int"
+    if kind == "int" and float in types:
+        raise TypeError("an int array can't hold floats")
+    return kind
+
+def largest_magnitude(value):
+    """abs() of an int, or of the biggest item of an int64 ndarray, as a Python int"""
+    if type(value) is int:
+        return abs(value)
+    if not len(value):
+        return 0
+    return max(-int(value.min()), int(value.max()))
+
+def could_overflow(op, left, right):
+    """Whether the int64 result of op(left, right) could wrap around in NumPy, going by the biggest operands"""
+    left, right = largest_magnitude(left), largest_magnitude(right)
+    if max(left, right) > INT_MAX:
+        return True
+    if op is operator.mod:
+        # The result is never bigger than the operands
+        return False
+    return (left * right if op is operator.mul else left + right) > INT_MAX
+
+class SpokeArray:
+    """Numbers of one kind, int or float, stored side by side
+
+    data is a NumPy ndarray or an array.array. Arithmetic with a number, or
+    with an array of the same length, works item by item and gives a new
+    array. Items, sums and so on come out as plain ints and floats.
+    """
+    __slots__ = ("data", "kind")
+
+    def __init__(self, values=(), kind=None):
+        if isinstance(values, SpokeArray) and kind in (None, values.kind):
+            kind, values = values.kind, values.data
+        else:
+            if not isinstance(values, list):
+                values = list(values)
+            kind = array_kind(values, kind)
+        typecode, dtype = ARRAY_KINDS[kind]
+        if USE_NUMPY:
+            self.data = int_ndarray(values) if kind == "int" else numpy.array(values, dtype=dtype)
+        else:
+            self.data = typed_array(typecode, values)
+        self.kind = kind
+
+    @classmethod
+    def wrap(cls, data, kind):
+        """An array around data as it is, without copying or checking it"""
+        result = cls.__new__(cls)
+        result.data = data
+        result.kind = kind
+        return result
+
+    def is_numpy(self):
+        return not isinstance(self.data, array)
+
+    def tolist(self):
+        return self.data.tolist()
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.data.tolist())
+
+    def __contains__(self, value):
+        return type(value) in (int, float) and value in self.data
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            data = self.data[index]
+            return SpokeArray.wrap(data.copy() if self.is_numpy() else data, self.kind)
+        value = self.data[index]
+        return value.item() if self.is_numpy() else value
+
+    def combine(self, other, op, reverse=False):
+        """self op other item by item, other op self with reverse"""
+        if isinstance(other, SpokeArray):
+            if len(other) != len(self):
+                raise ValueError(f"can't combine arrays of {len(self)} and {len(other)} items")
+            other_kind, other_data, other_items = other.kind, other.data, other.data
+        elif type(other) is int or type(other) is float:
+            other_kind, other_data, other_items = ("float" if type(other) is float else "int"), other, repeat(other)
+        else:
+            return NotImplemented
+        kind = "float" if op is operator.truediv or "float" in (self.kind, other_kind) else "int"
+
+        if self.is_numpy():
+            left, right = (other_data, self.data) if reverse else (self.data, other_data)
+            # NumPy gives inf or 0 for a division by zero, Spoke stops like it does for numbers
+            if op in (operator.truediv, operator.mod) and not numpy.all(right):
+                raise ZeroDivisionError("division by zero")
+            if kind == "int" and could_overflow(op, left, right):
+                # Python ints don't wrap around, the int64 array then only holds what fits
+                exact = op(numpy.array(left, dtype=object), numpy.array(right, dtype=object))
+                return SpokeArray.wrap(int_ndarray(exact), kind)
+            return SpokeArray.wrap(op(left, right), kind)
+        left, right = (other_items, self.data) if reverse else (self.data, other_items)
+        # array.array fills faster from a list than from map's items one at a time
+        return SpokeArray.wrap(typed_array(ARRAY_KINDS[kind][0], list(map(op, left, right))), kind)
+
+    def __add__(self, other):
+        return self.combine(other, operator.add)
+
+    def __radd__(self, other):
+        return self.combine(other, operator.add, True)
+
+    def __sub__(self, other):
+        return self.combine(other, operator.sub)
+
+    def __rsub__(self, other):
+        return self.combine(other, operator.sub, True)
+
+    def __mul__(self, other):
+        return self.combine(other, operator.mul)
+
+    def __rmul__(self, other):
+        return self.combine(other, operator.mul, True)
+
+    def __truediv__(self, other):
+        return self.combine(other, operator.truediv)
+
+    def __rtruediv__(self, other):
+        return self.combine(other, operator.truediv, True)
+
+    def __mod__(self, other):
+        return self.combine(other, operator.mod)
+
+    def __rmod__(self, other):
+        return self.combine(other, operator.mod, True)
+
+    def __neg__(self):
+        if self.is_numpy():
+            # -INT_MIN is the one int64 that doesn't fit once negated
+            if self.kind == "int" and len(self.data) and self.data.min() == INT_MIN:
+                raise OverflowError(INT_OVERFLOW)
+            return SpokeArray.wrap(-self.data, self.kind)
+        return SpokeArray.wrap(typed_array(self.data.typecode, list(map(operator.neg, self.data))), self.kind)
+
+    def __eq__(self, other):
+        return isinstance(other, SpokeArray) and len(self) == len(other) and self.tolist() == other.tolist()
+
+    __hash__ = None
+
+    def select(self, op_func, operand):
+        """A new array of the items for which op_func(item, operand) holds, operand a number"""
+        if self.is_numpy():
+            return SpokeArray.wrap(self.data[op_func(self.data, operand)], self.kind)
+        kept = list(compress(self.data, map(op_func, self.data, repeat(operand))))
+        return SpokeArray.wrap(array(self.data.typecode, kept), self.kind)
+
+    def sum(self):
+        if not self.is_numpy():
+            return sum(self.data)
+        if self.kind == "int" and len(self.data) * largest_magnitude(self.data) > INT_MAX:
+            # A Python int, as big as it needs to be, like the array.array backend gives
+            return sum(self.data.tolist())
+        return self.data.sum().item()
+
+    def min(self):
+        return self.data.min().item() if self.is_numpy() else min(self.data)
+
+    def max(self):
+        return self.data.max().item() if self.is_numpy() else max(self.data)
+
+    def sort(self):
+        if self.is_numpy():
+            self.data.sort()
+        else:
+            self.data = array(self.data.typecode, sorted(self.data))
+
+    def reverse(self):
+        if self.is_numpy():
+            self.data = self.data[::-1].copy()
+        else:
+            self.data.reverse()
+
+    def replace(self, other):
+        """Take other's items, for commands that change an array in place"""
+        self.data = other.data
+        self.kind = other.kind
+
+    def __repr__(self):
+        return f"array({self.data.tolist()})"
@@ -0,0 +1,558 @@
+import sys
+from spokeParser import Statement, FunctionDef, IfChain, WhileLoop, ForLoop, Return
+from spokeTokens import NAME, INDEX, LIST_LITERAL, is_quoted, token_type
+from spokeTypes import SpokeSet
+from spokeFunctions import call_function, make_function
+from spokeExpr import EXPRESSION_FUNCTIONS, ExpressionError, index_value, parse_assignment, parse_math
+
+# Opcodes
+LOAD_CONST = 0
+LOAD_NAME = 1
+LOAD_VALUE = 2
+STORE_NAME = 3
+POP_TOP = 4
+DUP_TOP = 5
+BINARY_OP = 6
+COMPARE_OP = 7
+UNARY_NOT = 8
+JUMP_IF_FALSE_OR_POP = 9
+JUMP_IF_TRUE_OR_POP = 10
+JUMP = 11
+JUMP_IF_FALSE = 12
+EVAL_CONDITION = 13
+PRINT_CONST = 14
+PRINT_NAME = 15
+PRINT_TOP = 16
+MAKE_FUNCTION = 17
+CALL = 18
+CALL_COMMAND = 19
+GET_ITER = 20
+FOR_ITER = 21
+UNARY_NEGATIVE = 22
+CALL_BUILTIN = 23
+BINARY_SUBSCR = 24
+BUILD_LIST = 25
+BUILD_MAP = 26
+BUILD_SET = 27
+CALL_FUNCTION = 28
+RETURN_VALUE = 29
+
+OPNAMES = [
+    "LOAD_CONST", "LOAD_NAME", "LOAD_VALUE", "STORE_NAME", "POP_TOP", "DUP_TOP",
+    "BINARY_OP", "COMPARE_OP", "UNARY_NOT", "JUMP_IF_FALSE_OR_POP",
+    "JUMP_IF_TRUE_OR_POP", "JUMP", "JUMP_IF_FALSE", "EVAL_CONDITION", "PRINT_CONST", "PRINT_NAME", "PRINT_TOP",
+    "MAKE_FUNCTION", "CALL", "CALL_COMMAND", "GET_ITER", "FOR_ITER",
+    "UNARY_NEGATIVE", "CALL_BUILTIN", "BINARY_SUBSCR", "BUILD_LIST", "BUILD_MAP", "BUILD_SET",
+    "CALL_FUNCTION", "RETURN_VALUE",
+]
+
+class Code:
+    """A compiled block: instructions plus the source line each one came from"""
+    __slots__ = ("name", "instructions", "positions")
+
+    def __init__(self, name):
+        self.name = name
+        self.instructions = []
+        # (lineno, line) for every instruction, used for error messages and --dis
+        self.positions = []
+
+def print_sentence(tokens):
+    """The text cmd_print prints for print ( ... )"""
+    words = []
+    for token in tokens:
+        words.append(token[1:-1] if is_quoted(token) else token)
+    return " ".join(words)
+
+def collect_function_names(nodes, names):
+    """Every function name defined anywhere in the program"""
+    for node in nodes:
+        if type(node) is FunctionDef:
+            names.add(node.name)
+            collect_function_names(node.body, names)
+        elif type(node) in (WhileLoop, ForLoop):
+            collect_function_names(node.body, names)
+        elif type(node) is IfChain:
+            for branch in node.branches:
+                collect_function_names(branch.body, names)
+    return names
+
+# Commands compiled to instructions instead of being called, unless a
+# commands/cmd_<name>.py overrides them
+INLINE_COMMANDS = ("let", "math", "print")
+
+def never_overridden(command_name):
+    return False
+
+class Compiler:
+    """Compiles parsed statement nodes into Code objects"""
+
+    def __init__(self, function_names, is_overridden=never_overridden):
+        # Commands that share a name with a Spoke function are never compiled natively
+        self.function_names = function_names
+        # The interpreter's is_overridden, whether a command file replaces a built-in command
+        self.is_overridden = is_overridden
+
+    def compile(self, nodes, name):
+        code = Code(name)
+        for node in nodes:
+            self.compile_node(code, node)
+        return code
+
+    def emit(self, code, op, arg, node):
+        code.instructions.append((op, arg))
+        code.positions.append((node.lineno, node.line))
+        return len(code.instructions) - 1
+
+    def emit_load(self, code, token, node):
+        """Push the value get_val would return for token"""
+        kind, value = token_type(token)
+        if kind is NAME and token.isidentifier():
+            self.emit(code, LOAD_NAME, token, node)
+        elif kind is NAME or kind is INDEX or kind is LIST_LITERAL:
+            self.emit(code, LOAD_VALUE, token, node)
+        else:
+            # Numbers and quoted strings
+            self.emit(code, LOAD_CONST, value, node)
+
+    def compile_node(self, code, node):
+        node_type = type(node)
+        if node_type is Statement:
+            self.compile_statement(code, node)
+        elif node_type is IfChain:
+            self.compile_if_chain(code, node)
+        elif node_type is WhileLoop:
+            self.compile_while(code, node)
+        elif node_type is ForLoop:
+            self.compile_for(code, node)
+        elif node_type is Return:
+            self.compile_expression(code, node.value, node, None)
+            self.emit(code, RETURN_VALUE, None, node)
+        elif node_type is FunctionDef:
+            self.emit(code, MAKE_FUNCTION, (node, self.compile(node.body, node.name)), node)
+
+    def compile_statement(self, code, node):
+        tokens = node.tokens
+        command = tokens[0]
+
+        if command in self.function_names:
+            if node.call_args is not None:
+                for token in node.call_args:
+                    self.emit_load(code, token, node)
+                self.emit(code, CALL, (command, len(node.call_args), node), node)
+            else:
+                self.emit(code, CALL_COMMAND, node, node)
+        elif command in INLINE_COMMANDS and self.is_overridden(command):
+            self.emit(code, CALL_COMMAND, node, node)
+        elif command == "let" and self.compile_let(code, node):
+            pass
+        elif command == "math" and self.compile_math(code, node):
+            pass
+        elif command == "print" and self.compile_print(code, node):
+            pass
+        else:
+            self.emit(code, CALL_COMMAND, node, node)
+
+    def compile_let(self, code, node):
+        """let var = expression, mirroring builtin_let"""
+        try:
+            name, tree = parse_assignment(node.line)
+        except ExpressionError:
+            # Left to the command, which reports the error when the line runs
+            return False
+        self.compile_expression(code, tree, node, "Let operation error")
+        self.emit(code, STORE_NAME, name, node)
+        return True
+
+    def compile_math(self, code, node):
+        """math expression [silent/loud] [var], mirroring builtin_math"""
+        try:
+            tree, loud, name = parse_math(node.line)
+        except ExpressionError:
+            return False
+
+        self.compile_expression(code, tree, node, "Math error")
+        if name is not None:
+            if loud:
+                self.emit(code, DUP_TOP, None, node)
+                self.emit(code, PRINT_TOP, None, node)
+            self.emit(code, STORE_NAME, name, node)
+        elif loud:
+            self.emit(code, PRINT_TOP, None, node)
+        else:
+            self.emit(code, POP_TOP, None, node)
+        return True
+
+    def compile_print(self, code, node):
+        """print var / print ( text ), mirroring cmd_print.py"""
+        tokens = node.tokens
+        if len(tokens) >= 3 and tokens[1] == "(" and tokens[-1] == ")":
+            self.emit(code, PRINT_CONST, print_sentence(tokens[2:-1]), node)
+        elif len(tokens) == 2:
+            self.emit(code, PRINT_NAME, tokens[1], node)
+        else:
+            return False
+        return True
+
+    def compile_condition(self, code, branch):
+        """Compile the condition of an if branch or while loop"""
+        if branch.test is None:
+            # Malformed, warns and counts as false when it runs
+            self.emit(code, EVAL_CONDITION, branch, branch)
+        else:
+            self.compile_expression(code, branch.test, branch, None)
+
+    def compile_expression(self, code, tree, node, error_prefix):
+        """Compile an expression tree from spokeExpr, leaving its value on the stack
+
+        error_prefix starts the message printed when arithmetic fails, as
+        builtin_let and builtin_math print it. Conditions pass None and fail
+        like any other error on their line.
+        """
+        kind = tree[0]
+        if kind == "const":
+            self.emit(code, LOAD_CONST, tree[1], node)
+        elif kind == "name":
+            self.emit(code, LOAD_NAME, tree[1], node)
+        elif kind == "binary":
+            self.compile_expression(code, tree[2], node, error_prefix)
+            self.compile_expression(code, tree[3], node, error_prefix)
+            self.emit(code, BINARY_OP, (tree[1], error_prefix), node)
+        elif kind == "compare":
+            _, op, left, right, negate = tree
+            self.compile_expression(code, left, node, error_prefix)
+            self.compile_expression(code, right, node, error_prefix)
+            self.emit(code, COMPARE_OP, op, node)
+            if negate:
+                self.emit(code, UNARY_NOT, None, node)
+        elif kind in ("and", "or"):
+            # and / or skip their right side like Python's
+            self.compile_expression(code, tree[1], node, error_prefix)
+            jump_op = JUMP_IF_FALSE_OR_POP if kind == "and" else JUMP_IF_TRUE_OR_POP
+            jump = self.emit(code, jump_op, None, node)
+            self.compile_expression(code, tree[2], node, error_prefix)
+            code.instructions[jump] = (jump_op, len(code.instructions))
+        elif kind == "not":
+            self.compile_expression(code, tree[1], node, error_prefix)
+            self.emit(code, UNARY_NOT, None, node)
+        elif kind == "neg":
+            self.compile_expression(code, tree[1], node, error_prefix)
+            self.emit(code, UNARY_NEGATIVE, error_prefix, node)
+        elif kind in ("call", "function"):
+            for arg in tree[2]:
+                self.compile_expression(code, arg, node, error_prefix)
+            self.emit(code, CALL_BUILTIN if kind == "call" else CALL_FUNCTION, (tree[1], len(tree[2]), error_prefix), node)
+        elif kind == "index":
+            self.compile_expression(code, tree[1], node, error_prefix)
+            self.compile_expression(code, tree[2], node, error_prefix)
+            self.emit(code, BINARY_SUBSCR, None, node)
+        elif kind == "list":
+            for item in tree[1]:
+                self.compile_expression(code, item, node, error_prefix)
+            self.emit(code, BUILD_LIST, len(tree[1]), node)
+        elif kind == "map":
+            for key, value in tree[1]:
+                self.compile_expression(code, key, node, error_prefix)
+                self.compile_expression(code, value, node, error_prefix)
+            self.emit(code, BUILD_MAP, (len(tree[1]), error_prefix), node)
+        elif kind == "set":
+            for item in tree[1]:
+                self.compile_expression(code, item, node, error_prefix)
+            self.emit(code, BUILD_SET, (len(tree[1]), error_prefix), node)
+
+    def compile_if_chain(self, code, chain):
+        end_jumps = []
+        for index, branch in enumerate(chain.branches):
+            next_jump = None
+            if branch.condition is not None:
+                self.compile_condition(code, branch)
+                next_jump = self.emit(code, JUMP_IF_FALSE, None, branch)
+            for node in branch.body:
+                self.compile_node(code, node)
+            if index < len(chain.branches) - 1:
+                end_jumps.append(self.emit(code, JUMP, None, branch))
+            if next_jump is not None:
+                code.instructions[next_jump] = (JUMP_IF_FALSE, len(code.instructions))
+            else:
+                break
+        for jump in end_jumps:
+            code.instructions[jump] = (JUMP, len(code.instructions))
+
+    def compile_while(self, code, loop):
+        start = len(code.instructions)
+        self.compile_condition(code, loop)
+        exit_jump = self.emit(code, JUMP_IF_FALSE, None, loop)
+        for node in loop.body:
+            self.compile_node(code, node)
+        self.emit(code, JUMP, start, loop)
+        code.instructions[exit_jump] = (JUMP_IF_FALSE, len(code.instructions))
+
+    def compile_for(self, code, loop):
+        self.emit(code, GET_ITER, loop, loop)
+        start = self.emit(code, FOR_ITER, None, loop)
+        for node in loop.body:
+            self.compile_node(code, node)
+        self.emit(code, JUMP, start, loop)
+        code.instructions[start] = (FOR_ITER, (loop.var, len(code.instructions)))
+
+def compile_program(nodes, is_overridden=never_overridden):
+    """Compile a parsed program into a Code object"""
+    compiler = Compiler(collect_function_names(nodes, set()), is_overridden)
+    return compiler.compile(nodes, "<module>")
+
+class VM:
+    """Stack machine that runs compiled Code objects against the interpreter state"""
+
+    def __init__(self, call_stack, functions, get_val, errorLine, run_command, condition_holds, compare, frame_type, loop_values):
+        # The interpreter's call stack, the last entry is the running function's scope
+        self.call_stack = call_stack
+        self.frame_type = frame_type
+        self.loop_values = loop_values
+        self.functions = functions
+        self.get_val = get_val
+        self.errorLine = errorLine
+        self.run_command = run_command
+        self.condition_holds = condition_holds
+        self.compare = compare
+
+    def binary_op(self, left, op, right, error_prefix, position):
+        """The arithmetic shared by builtin_let and builtin_math"""
+        try:
+            if op == '+':
+                return left + right
+            elif op == '-':
+                return left - right
+            elif op == '*':
+                return left * right
+            elif op == '/':
+                return left / right
+            else:
+                return left % right
+        except Exception as e:
+            self.expression_failed(e, error_prefix, position)
+
+    def expression_failed(self, error, error_prefix, position):
+        """Report an error in a let / math expression the way run_expression does"""
+        if error_prefix is None:
+            # A condition, reported by run like any other error on the line
+            raise error
+        if isinstance(error, ZeroDivisionError):
+            print("Error: Division by zero")
+        else:
+            print(f"{error_prefix}: {error}")
+        self.errorLine(*position)
+
+    def build_collection(self, op, stack, count, error_prefix, position):
+        """Pop the items of a map or set literal off the stack and build it"""
+        size = count * 2 if op == BUILD_MAP else count
+        items = stack[len(stack) - size:]
+        del stack[len(stack) - size:]
+        try:
+            if op == BUILD_MAP:
+                return dict(zip(items[::2], items[1::2]))
+            return SpokeSet(items)
+        except TypeError as e:
+            # An unhashable key, like a list
+            self.expression_failed(e, error_prefix, position)
+
+    def call_builtin(self, name, args, error_prefix, position):
+        """Call one of spokeExpr.EXPRESSION_FUNCTIONS"""
+        try:
+            return EXPRESSION_FUNCTIONS[name](*args)
+        except Exception as e:
+            self.expression_failed(e, error_prefix, position)
+
+    def call_value(self, name, args, error_prefix, position):
+        """Call a Spoke function from an expression, returns its return value"""
+        try:
+            return call_function(self.functions, name, args)
+        except Exception as e:
+            self.expression_failed(e, error_prefix, position)
+
+    def call(self, name, args, node):
+        """Call a Spoke function, or run the line as a command if no such function exists yet"""
+        function = self.functions.get(name)
+        if function is None:
+            self.run_command(node)
+            return
+
+        if len(args) != len(function['params']):
+            self.errorLine(node.lineno, node.line)
+        function['call'](args)
+
+    def run_function(self, function, args):
+        """Run the code of a function defined by the VM, returns its return value"""
+        call_stack = self.call_stack
+        call_stack.append(self.frame_type(zip(function['params'], args), call_stack[0]))
+        try:
+            return self.run(function['code'])
+        finally:
+            call_stack.pop()
+
+    def run(self, code):
+        """Execute a Code object, returns the value of the return line that ended it, if any"""
+        instructions = code.instructions
+        end = len(instructions)
+        variables = self.call_stack[-1]
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+
+        try:
+            while pc < end:
+                op, arg = instructions[pc]
+                pc += 1
+
+                if op == LOAD_NAME:
+                    push(variables[arg] if arg in variables else arg)
+                elif op == LOAD_CONST:
+                    push(arg)
+                elif op == STORE_NAME:
+                    variables[arg] = pop()
+                elif op == CALL_COMMAND:
+                    if arg.tokens[0] in self.functions:
+                        # Function name without (args)
+                        self.errorLine(arg.lineno, arg.line)
+                    self.run_command(arg)
+                elif op == BINARY_OP:
+                    right = pop()
+                    push(self.binary_op(pop(), arg[0], right, arg[1], code.positions[pc - 1]))
+                elif op == COMPARE_OP:
+                    right = pop()
+                    lineno, line = code.positions[pc - 1]
+                    push(self.compare(pop(), right, arg, lineno, line))
+                elif op == JUMP_IF_FALSE:
+                    if not pop():
+                        pc = arg
+                elif op == JUMP:
+                    pc = arg
+                elif op == FOR_ITER:
+                    value = next(stack[-1], stack)
+                    if value is stack:
+                        # Loop finished, drop the iterator
+                        pop()
+                        pc = arg[1]
+                    elif arg[0] is not None:
+                        variables[arg[0]] = value
+                elif op == GET_ITER:
+                    push(iter(self.loop_values(arg)))
+                elif op == PRINT_CONST:
+                    print(arg)
+                elif op == PRINT_NAME:
+                    if arg in variables:
+                        print(variables[arg])
+                    else:
+                        print(f"Variable '{arg}' not found")
+                        self.errorLine(*code.positions[pc - 1])
+                elif op == CALL:
+                    name, argc, node = arg
+                    if argc:
+                        args = stack[-argc:]
+                        del stack[-argc:]
+                    else:
+                        args = []
+                    self.call(name, args, node)
+                elif op == JUMP_IF_FALSE_OR_POP:
+                    if stack[-1]:
+                        pop()
+                    else:
+                        pc = arg
+                elif op == JUMP_IF_TRUE_OR_POP:
+                    if stack[-1]:
+                        pc = arg
+                    else:
+                        pop()
+                elif op == UNARY_NOT:
+                    push(not pop())
+                elif op == LOAD_VALUE:
+                    push(self.get_val(arg))
+                elif op == EVAL_CONDITION:
+                    push(self.condition_holds(arg))
+                elif op == BINARY_SUBSCR:
+                    index = pop()
+                    push(index_value(pop(), index))
+                elif op == CALL_FUNCTION:
+                    name, argc, error_prefix = arg
+                    args = stack[len(stack) - argc:]
+                    del stack[len(stack) - argc:]
+                    push(self.call_value(name, args, error_prefix, code.positions[pc - 1]))
+                elif op == RETURN_VALUE:
+                    return pop()
+                elif op == CALL_BUILTIN:
+                    name, argc, error_prefix = arg
+                    args = stack[len(stack) - argc:]
+                    del stack[len(stack) - argc:]
+                    push(self.call_builtin(name, args, error_prefix, code.positions[pc - 1]))
+                elif op == UNARY_NEGATIVE:
+                    value = pop()
+                    try:
+                        push(-value)
+                    except Exception as e:
+                        self.expression_failed(e, arg, code.positions[pc - 1])
+                elif op == BUILD_LIST:
+                    items = stack[len(stack) - arg:]
+                    del stack[len(stack) - arg:]
+                    push(items)
+                elif op in (BUILD_MAP, BUILD_SET):
+                    push(self.build_collection(op, stack, arg[0], arg[1], code.positions[pc - 1]))
+                elif op == PRINT_TOP:
+                    print(pop())
+                elif op == DUP_TOP:
+                    push(stack[-1])
+                elif op == POP_TOP:
+                    pop()
+                elif op == MAKE_FUNCTION:
+                    node, body_code = arg
+                    self.functions[node.name] = make_function(node, self.run_function, code=body_code)
+        except Exception as e:
+            lineno, line = code.positions[pc - 1]
+            print(f"DEBUG: Unexpected error on line {lineno}: {e}")
+            self.errorLine(lineno, line)
+
+def format_arg(op, arg):
+    """Readable operand for the disassembler"""
+    if arg is None:
+        return ""
+    if op == MAKE_FUNCTION:
+        memo = "@memo " if arg[0].memo is not None else ""
+        return f"{memo}{arg[0].name}({', '.join(arg[0].params)})"
+    if op in (CALL, CALL_BUILTIN, CALL_FUNCTION):
+        return f"{arg[0]} ({arg[1]} args)"
+    if op == CALL_COMMAND:
+        return f"cmd_{arg.tokens[0]}: {arg.line}"
+    if op == BINARY_OP:
+        return arg[0]
+    if op == UNARY_NEGATIVE:
+        return ""
+    if op == BUILD_LIST:
+        return f"{arg} items"
+    if op == BUILD_SET:
+        return f"{arg[0]} items"
+    if op == BUILD_MAP:
+        return f"{arg[0]} pairs"
+    if op == EVAL_CONDITION:
+        return " ".join(arg.condition)
+    if op in (JUMP, JUMP_IF_FALSE, JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP):
+        return f"to {arg}"
+    if op == FOR_ITER:
+        return f"{arg[0] or '_'}, done to {arg[1]}"
+    if op == GET_ITER:
+        return arg.line
+    return repr(arg)
+
+def disassemble(code, file=None):
+    """Print a readable listing of a Code object and every function it defines"""
+    file = file or sys.stdout
+    print(f"Disassembly of {code.name}:", file=file)
+    last_lineno = None
+    functions = []
+    for index, (op, arg) in enumerate(code.instructions):
+        lineno = code.positions[index][0]
+        line_column = str(lineno) if lineno != last_lineno else ""
+        last_lineno = lineno
+        print(f"{line_column:>5} {index:>6} {OPNAMES[op]:<20} {format_arg(op, arg)}".rstrip(), file=file)
+        if op == MAKE_FUNCTION:
+            functions.append(arg[1])
+    for function_code in functions:
+        print(file=file)
+        disassemble(function_code, file)
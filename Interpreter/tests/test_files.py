@@ -0,0 +1,82 @@
+"""
+Tests for the kept-open writers in spokeFiles.py.
+
+Run from the Interpreter folder: python -m unittest discover tests
+"""
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import spokeFiles
+from spokeInterpreter import Interpreter
+
+class ParkedWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.path = os.path.join(self.folder.name, "a.txt")
+        self.files = spokeFiles.Files()
+        self.addCleanup(self.files.close)
+
+    def open_others(self):
+        """Open more than MAX_WRITERS other files, so the first one is parked"""
+        for n in range(spokeFiles.MAX_WRITERS + 1):
+            self.files.open_file(os.path.join(self.folder.name, f"f{n}.txt"))
+
+    def test_reopening_a_parked_file_gives_the_same_writer(self):
+        first = self.files.open_file(self.path)
+        self.open_others()
+        self.assertIsNone(first.file)
+        second = self.files.open_file(self.path)
+        self.assertIs(first, second)
+
+        for handle, text in ((first, "one\n"), (second, "two\n"), (first, "three\n")):
+            handle.write(text)
+        self.files.close()
+        with open(self.path, "r") as f:
+            self.assertEqual(f.read(), "one\ntwo\nthree\n")
+
+    def test_reading_sees_what_a_parked_writer_wrote(self):
+        writer = self.files.open_file(self.path)
+        writer.write("one\n")
+        self.open_others()
+        self.files.append_text(self.path, "two\n")
+        self.assertEqual(self.files.read_line(self.path, 2), "two")
+
+class ReadAndForeachTest(unittest.TestCase):
+
+    def test_read_and_foreach_give_the_same_lines(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "lines.txt")
+            with open(path, "wb") as f:
+                f.write("caf\u00e9\r\nna\u00efve\rstill line two\n\u00fcber".encode("utf-8"))
+            files = spokeFiles.Files()
+            streamed = list(files.stream_lines(path))
+            indexed = [files.read_line(path, n) for n in range(1, len(streamed) + 1)]
+            files.close()
+        self.assertEqual(streamed, ["caf\u00e9", "na\u00efve\rstill line two", "\u00fcber"])
+        self.assertEqual(indexed, streamed)
+
+class InterpreterFilesTest(unittest.TestCase):
+
+    def test_a_run_only_closes_its_own_files(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "a.txt")
+            other = spokeFiles.Files()
+            writer = other.open_file(path)
+            writer.write("kept\n")
+            interpreter = Interpreter(output=io.StringIO())
+            script = f'open out "{os.path.join(folder, "b.txt")}"\nwrite out "x"\n'
+            self.assertTrue(interpreter.run_source(script))
+            self.assertIsNotNone(writer.file)
+            other.close()
+            with open(path, "r") as f:
+                self.assertEqual(f.read(), "kept\n")
+
+if __name__ == "__main__":
+    unittest.main()
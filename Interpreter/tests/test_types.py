@@ -0,0 +1,60 @@
+"""
+Tests for int overflow in SpokeArray (spokeTypes.py), with either backend.
+
+Run from the Interpreter folder: python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import spokeTypes
+from spokeTypes import INT_MAX, INT_MIN, INT_OVERFLOW, SpokeArray
+
+class IntOverflowTests:
+    """Run by a subclass for each backend, use_numpy says which"""
+    use_numpy = False
+
+    def setUp(self):
+        use_numpy = spokeTypes.USE_NUMPY
+        spokeTypes.USE_NUMPY = self.use_numpy
+        self.addCleanup(setattr, spokeTypes, "USE_NUMPY", use_numpy)
+
+    def assertOverflows(self, make):
+        with self.assertRaises(OverflowError) as caught:
+            make()
+        self.assertEqual(str(caught.exception), INT_OVERFLOW)
+
+    def test_items_past_64_bits(self):
+        self.assertOverflows(lambda: SpokeArray([INT_MAX + 1]))
+        self.assertOverflows(lambda: SpokeArray([INT_MIN - 1]))
+
+    def test_arithmetic_past_64_bits(self):
+        numbers = SpokeArray([1, INT_MAX])
+        self.assertOverflows(lambda: numbers + 1)
+        self.assertOverflows(lambda: 1 + numbers)
+        self.assertOverflows(lambda: numbers * 2)
+        self.assertOverflows(lambda: -numbers - 2)
+        self.assertOverflows(lambda: numbers + SpokeArray([0, 1]))
+        self.assertOverflows(lambda: -SpokeArray([INT_MIN]))
+        self.assertOverflows(lambda: numbers + (1 << 70))
+
+    def test_arithmetic_up_to_the_limit(self):
+        numbers = SpokeArray([INT_MAX - 1, INT_MIN + 1])
+        self.assertEqual((numbers + SpokeArray([1, -1])).tolist(), [INT_MAX, INT_MIN])
+        self.assertEqual((numbers * -1).tolist(), [-(INT_MAX - 1), INT_MAX])
+        self.assertEqual((SpokeArray([INT_MAX, 5]) % (1 << 70)).tolist(), [INT_MAX, 5])
+
+    def test_sum_past_64_bits(self):
+        self.assertEqual(SpokeArray([INT_MAX, INT_MAX]).sum(), 2 * INT_MAX)
+
+class ArrayBackendTest(IntOverflowTests, unittest.TestCase):
+    """NumPy unavailable: array.array"""
+
+@unittest.skipIf(spokeTypes.numpy is None, "NumPy is not installed")
+class NumpyBackendTest(IntOverflowTests, unittest.TestCase):
+    use_numpy = True
+
+if __name__ == "__main__":
+    unittest.main()
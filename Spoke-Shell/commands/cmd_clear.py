@@ -1,10 +1,13 @@
 import os
+import sys
 
 def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
     """
     Clear command: clears the screen
     """
     if len(tokens) == 1:
+        # Anything still buffered would otherwise appear after the clear
+        sys.stdout.flush()
         if os.name == 'nt':  # For Windows
             os.system('cls')
         else:  # For Linux/macOS
@@ -0,0 +1,19 @@
+from spokeFiles import Writer
+
+def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """
+    Handle close command
+    tokens format: ['close', 'out']
+    Writes out what is buffered and closes a file from open. Files still open
+    when the script ends are flushed then.
+    """
+
+    if len(tokens) != 2:
+        return False
+
+    handle = variables.get(tokens[1])
+    if not isinstance(handle, Writer):
+        print(f"Error: {tokens[1]} is not an open file")
+        return False
+    handle.close()
+    return True
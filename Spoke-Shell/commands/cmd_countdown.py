@@ -9,7 +9,7 @@ def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
         try:
             count_countdown = int(get_val(tokens[1]))
             for count_repeats in range(count_countdown):
-                print(count_countdown - count_repeats)
+                print(count_countdown - count_repeats, flush=True)
                 time.sleep(1)
                 
             if len(tokens) == 3:
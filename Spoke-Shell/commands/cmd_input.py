@@ -1,7 +1,11 @@
+import sys
+
 def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
     """
     Input command: input varname OR input varname prompt
     """
+    # Show everything printed so far before waiting for the answer
+    sys.stdout.flush()
     if len(tokens) == 2:
         inputVar = tokens[1]
         user_input = input("? ")
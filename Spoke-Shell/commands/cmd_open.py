@@ -0,0 +1,31 @@
+from spokeFiles import current_files
+
+def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """
+    Handle open command
+    tokens format: ['open', 'out', 'report', 'txt'] or ['open', 'out', 'report', 'txt', 'overwrite']
+    Stores a handle to the file in the variable for write, flush and close.
+    Writes go to the end of the file, with overwrite it is emptied first.
+    """
+
+    if len(tokens) < 3:
+        return False
+
+    handle_name = tokens[1]
+    args = tokens[2:]
+    overwrite = len(args) > 1 and args[-1] == "overwrite"
+    if overwrite:
+        args = args[:-1]
+
+    # A quoted name or a variable holding one, otherwise rebuild it: report txt -> report.txt
+    if len(args) == 1 and (args[0].startswith('"') or args[0].startswith("'") or args[0] in variables):
+        fileName = str(get_val(args[0]))
+    else:
+        fileName = ".".join(args)
+
+    try:
+        variables[handle_name] = current_files().open_file(fileName, overwrite)
+    except OSError as e:
+        print(f"Error: Could not open {fileName}: {e.strerror}")
+        return False
+    return True
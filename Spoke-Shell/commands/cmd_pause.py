@@ -1,9 +1,13 @@
+import sys
+
 def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
     """
     Pause command: pause silent OR pause loud [message]
     """
     if len(tokens) == 1:
         tokens.append("silent")
+    # Show everything printed so far before waiting
+    sys.stdout.flush()
 
     if len(tokens) in (2, 3):
         if tokens[1] == "loud":
@@ -15,6 +15,7 @@ def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
             print("Unknown Quit Argument, Fatal Error")
             return False
         
-        quit()
+        # Not quit(), which closes sys.stdin and breaks the shell's next input()
+        raise SystemExit
     else:
         return False
\ No newline at end of file
@@ -1,9 +1,11 @@
-import os
+from spokeFiles import ENCODING, current_files
 
 def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
     """
     Handle read command
     tokens format: ['read', 'sample', 'txt'] or ['read', 'sample', 'txt', '1'] etc.
+    Single lines come from an index of the file built the first time it's read
+    (see spokeFiles.py), so reading line after line costs one scan of the file.
     """
     
     if len(tokens) < 3:
@@ -20,48 +22,46 @@ def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
         fileName = args[0]
         remaining_args = []
     
-    # Check if file exists and read it
-    try:
-        with open(fileName, "r") as f:
-            file_lines = f.readlines()
-    except Exception as e:
-        return False
-    
     # Handle different cases
-    if len(remaining_args) == 0:
-        # read sample.txt - print entire file
-        for line_content in file_lines:
-            print(line_content.rstrip())
-    
-    elif len(remaining_args) == 1:
-        arg = remaining_args[0]
+    try:
+        files = current_files()
+        # Anything saved to the file and still buffered is written out first
+        files.flush_file(fileName)
+        if len(remaining_args) == 0:
+            # read sample.txt - print entire file, a line at a time
+            with open(fileName, "r", encoding=ENCODING) as f:
+                for line_content in f:
+                    print(line_content.rstrip())
         
-        if arg.isdigit():
-            # read sample.txt 1 - print specific line
-            line_num = int(arg)
-            if 1 <= line_num <= len(file_lines):
-                print(file_lines[line_num - 1].rstrip())
+        elif len(remaining_args) == 1:
+            arg = remaining_args[0]
+            
+            if arg.isdigit():
+                # read sample.txt 1 - print specific line
+                line_content = files.read_line(fileName, int(arg))
+                if line_content is None:
+                    return False
+                print(line_content.rstrip())
             else:
-                return False
-        else:
-            # read sample.txt variableName - store entire file
-            content = "".join(file_lines).rstrip()
-            variables[arg] = content
-    
-    elif len(remaining_args) == 2:
-        # read sample.txt 1 variableName - store specific line
-        line_arg = remaining_args[0]
-        var_name = remaining_args[1]
+                # read sample.txt variableName - store entire file
+                with open(fileName, "r", encoding=ENCODING) as f:
+                    variables[arg] = f.read().rstrip()
         
-        if line_arg.isdigit():
-            line_num = int(line_arg)
-            if 1 <= line_num <= len(file_lines):
-                variables[var_name] = file_lines[line_num - 1].rstrip()
-            else:
+        elif len(remaining_args) == 2:
+            # read sample.txt 1 variableName - store specific line,
+            # the line number can be a variable: read sample.txt i variableName
+            line_num = get_val(remaining_args[0])
+            var_name = remaining_args[1]
+            
+            if not isinstance(line_num, int):
                 return False
+            line_content = files.read_line(fileName, line_num)
+            if line_content is None:
+                return False
+            variables[var_name] = line_content.rstrip()
         else:
             return False
-    else:
+    except Exception as e:
         return False
     
     return True
\ No newline at end of file
@@ -1,3 +1,4 @@
+import sys
 import time
 
 def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
@@ -7,6 +8,7 @@ def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
     if len(tokens) == 2:
         try:
             seconds = int(get_val(tokens[1]))
+            sys.stdout.flush()
             time.sleep(seconds)
             return True
         except ValueError:
@@ -1,16 +1,22 @@
 # commands/spk.py
 import os
 import subprocess
+import sys
+import time
+
+USAGE = "Usage: spk [--subprocess] [--time] <file.spk>"
 
 def run(args):
-    if not args:
-        print("Usage: spk <file.spk>")
+    flags = [arg for arg in args if arg.startswith("--")]
+    params = [arg for arg in args if not arg.startswith("--")]
+    if len(params) != 1 or any(flag not in ("--subprocess", "--time") for flag in flags):
+        print(USAGE)
         return
-    
-    filename = args[0]
-    
-    current_dir = os.path.dirname(os.path.abspath(__file__))  
-    parent_dir = os.path.dirname(current_dir)                
+
+    filename = params[0]
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    parent_dir = os.path.dirname(current_dir)
 
     editor_path = os.path.join(parent_dir, "spoke.py")
     if not os.path.isfile(editor_path):
@@ -27,26 +33,58 @@ def run(args):
     if not os.path.isabs(filename):
         file_path = os.path.abspath(os.path.join(os.getcwd(), filename))
 
+    start = time.perf_counter()
+    if "--subprocess" in flags:
+        run_subprocess(editor_path, file_path)
+    else:
+        run_in_process(parent_dir, file_path)
+    if "--time" in flags:
+        print(f"Ran in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+def run_in_process(parent_dir, file_path):
+    """Run the script inside the shell with a fresh interpreter, printing as it goes"""
+    if parent_dir not in sys.path:
+        sys.path.insert(0, parent_dir)
+    from spokeInterpreter import Interpreter
+
+    # A new Interpreter per run, so no variables or functions carry over between scripts
+    interpreter = Interpreter(os.path.join(parent_dir, "commands"))
+    try:
+        completed = interpreter.run_file(file_path)
+    except KeyboardInterrupt:
+        print("\nProgram interrupted")
+        return
+    except Exception as e:
+        print(f"Error: Could not run program: {e}")
+        return
+
+    if completed:
+        print("Program completed successfully")
+    else:
+        print("Program stopped on an error")
+
+def run_subprocess(editor_path, file_path):
+    """Run the script in its own Python process, for scripts that need full isolation"""
     try:
         # Run the spoke program with the correct full path
         process = subprocess.Popen(
-            ["python", "-u", editor_path, file_path],
+            [sys.executable, "-u", editor_path, file_path],
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
             text=True,
             bufsize=0
         )
-        
+
         # Print output in real-time
         for line in process.stdout:
             print(line, end='')
-            
+
         process.wait()
-            
+
         if process.returncode != 0:
             print(f"Program exited with code {process.returncode}")
         else:
             print("Program completed successfully")
 
     except Exception as e:
-        print(f"Error: Could not run program: {e}")
\ No newline at end of file
+        print(f"Error: Could not run program: {e}")
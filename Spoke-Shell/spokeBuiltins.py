@@ -0,0 +1,636 @@
+"""
+Core list, map, set and variable commands that run inside the interpreter.
+
+Each function takes the same arguments and returns the same result as the
+run function of the matching commands/cmd_<name>.py file, so a command file
+can replace any of them (see Interpreter.find_command in spokeInterpreter.py).
+The map and set commands (map, set, put, get, has, keys), memo and return
+have no file of their own, nor do array and the commands that work on a
+whole list at once (range, sum, min, max, map over a list, filter, reduce,
+unique, zip, see spokeLists).
+"""
+import operator
+from spokeExpr import (BINARY_OPERATORS, COMPARE_OPERATORS, ExpressionError, calls_functions, compile_expression,
+                       index_value, parse_assignment, parse_expression, parse_math, run_expression)
+from spokeLists import ITEM_FUNCTIONS, filter_items, map_items, reduce_items, unique_items, zip_items
+from spokeTypes import ARRAY_KINDS, SpokeArray, SpokeSet, is_collection, make_set
+from spokeTokens import number_value
+
+# let / map / set / math line -> its compiled form or the ExpressionError it
+# raised, filled the first time each line runs. A line that calls Spoke
+# functions is compiled against one interpreter's functions and kept in its
+# Functions.compiled instead, so these don't keep any interpreter alive
+ASSIGNMENT_LINES = {}
+MATH_LINES = {}
+# Most lines kept in each, so scripts made up as they run can't grow them forever
+MAX_COMPILED_LINES = 1 << 12
+
+def compiled_line(cache, line, functions, compile):
+    """The compiled form of line from cache or functions.compiled, compiling it on first use"""
+    compiled = cache.get(line)
+    if compiled is not None:
+        return compiled
+    local = getattr(functions, "compiled", None)
+    key = (compile, line)
+    if local is not None:
+        compiled = local.get(key)
+        if compiled is not None:
+            return compiled
+
+    try:
+        calls, compiled = compile(line, functions)
+    except ExpressionError as e:
+        calls, compiled = False, e
+    if not calls:
+        if len(cache) < MAX_COMPILED_LINES:
+            cache[line] = compiled
+    elif local is not None and len(local) < MAX_COMPILED_LINES:
+        local[key] = compiled
+    return compiled
+
+def compile_assignment(line, functions):
+    name, tree = parse_assignment(line)
+    return calls_functions(tree), (name, compile_expression(tree, functions))
+
+def compile_math(line, functions):
+    tree, loud, name = parse_math(line)
+    return calls_functions(tree), (compile_expression(tree, functions), loud, name)
+
+def compiled_assignment(line, functions):
+    """(var, evaluate) for a let, map or set line"""
+    return compiled_line(ASSIGNMENT_LINES, line, functions, compile_assignment)
+
+def compiled_math(line, functions):
+    """(evaluate, loud, var) for a math line"""
+    return compiled_line(MATH_LINES, line, functions, compile_math)
+
+def builtin_let(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """let var = expression"""
+    compiled = compiled_assignment(line, functions)
+    if isinstance(compiled, ExpressionError):
+        print(f"Invalid expression: {compiled}")
+        return False
+    name, evaluate = compiled
+    ok, result = run_expression(evaluate, variables, "Let operation error")
+    if ok:
+        variables[name] = result
+    return ok
+
+def builtin_math(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """math expression silent/loud varname"""
+    compiled = compiled_math(line, functions)
+    if isinstance(compiled, ExpressionError):
+        print(f"Invalid expression: {compiled}")
+        return False
+    evaluate, loud, name = compiled
+    ok, result = run_expression(evaluate, variables, "Math error")
+    if not ok:
+        return False
+    if loud:
+        print(result)
+    if name is not None:
+        variables[name] = result
+    return True
+
+def builtin_print(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """print varname OR print ( text here )"""
+    if len(tokens) >= 3 and tokens[1] == "(" and tokens[-1] == ")":
+        words = []
+        for token in tokens[2:-1]:
+            if (token.startswith('"') and token.endswith('"')) or (token.startswith("'") and token.endswith("'")):
+                words.append(token[1:-1])
+            else:
+                words.append(token)
+        print(" ".join(words))
+        return True
+    elif len(tokens) == 2:
+        if tokens[1] in variables:
+            print(variables[tokens[1]])
+            return True
+        print(f"Variable '{tokens[1]}' not found")
+        return False
+    return False
+
+def step_variable(tokens, variables, get_val, errorLine, lineNum, line, step):
+    """Shared body of inc and dec"""
+    if len(tokens) != 2:
+        print("Incorrect Arguements")
+        errorLine(lineNum, line)
+        return False
+
+    var = tokens[1]
+    try:
+        value = get_val(var)
+        if isinstance(value, str):
+            # A string read from a file or typed in, numbers from the script are numbers already
+            value = number_value(value)
+            if value is None:
+                errorLine(lineNum, line)
+                return False
+        variables[var] = step(value, 1)
+        return True
+    except Exception as e:
+        print(f"DEBUG: Exception occurred: {e}")
+        errorLine(lineNum, line)
+        return False
+
+def builtin_inc(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """inc varname"""
+    return step_variable(tokens, variables, get_val, errorLine, lineNum, line, operator.add)
+
+def builtin_dec(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """dec varname"""
+    return step_variable(tokens, variables, get_val, errorLine, lineNum, line, operator.sub)
+
+def builtin_delete(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """delete varname OR delete mymap key / delete myset value"""
+    if len(tokens) == 3:
+        return delete_key(variables, tokens[1], get_val(tokens[2]))
+    if len(tokens) != 2:
+        return False
+    if tokens[1] in variables:
+        del variables[tokens[1]]
+        return True
+    print("Variable not found")
+    return False
+
+def builtin_swap(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """swap var1 var2"""
+    if len(tokens) != 3:
+        print("Wrong Amount of Arguments")
+        return False
+    if tokens[1] in variables and tokens[2] in variables:
+        variables[tokens[1]], variables[tokens[2]] = variables[tokens[2]], variables[tokens[1]]
+        return True
+    print("Variables don't exist")
+    return False
+
+def builtin_toggle(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """toggle varname, between 0/1 or true/false"""
+    if len(tokens) != 2:
+        return False
+    if tokens[1] not in variables:
+        print("Variable not found")
+        return False
+    value = variables[tokens[1]]
+    if value in (0, 1):
+        variables[tokens[1]] = 1 - value
+    elif value in ("true", "false"):
+        variables[tokens[1]] = "true" if value == "false" else "false"
+    else:
+        print("Variable cannot be toggled")
+        return False
+    return True
+
+def get_list(variables, list_name):
+    """The list stored in list_name, or None"""
+    if list_name in variables:
+        value = variables[list_name]
+        if isinstance(value, list):
+            return value
+    return None
+
+def builtin_list(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """list mylist = [1,2,3] or list mylist = myarray"""
+    if len(tokens) >= 4 and tokens[2] == "=":
+        list_value = get_val(tokens[3])
+        if isinstance(list_value, SpokeArray):
+            list_value = list_value.tolist()
+        if isinstance(list_value, list):
+            variables[tokens[1]] = list_value
+            return True
+    return False
+
+def builtin_array(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """array nums = [1,2,3], array nums float = mylist or array nums = myarray"""
+    kind = tokens[2] if len(tokens) >= 3 and tokens[2] in ARRAY_KINDS else None
+    rest = tokens[3:] if kind else tokens[2:]
+    if len(rest) != 2 or rest[0] != "=":
+        print(f"Error: 'array' command needs a name, int or float if wanted, = and a list on line {lineNum}")
+        return False
+    values = get_val(rest[1])
+    if not isinstance(values, (list, SpokeArray)):
+        print(f"Error: '{rest[1]}' is not a list or array on line {lineNum}")
+        return False
+    try:
+        variables[tokens[1]] = SpokeArray(values, kind)
+        return True
+    except (TypeError, OverflowError) as e:
+        print(f"Error: Cannot make an array on line {lineNum}: {e}")
+        return False
+
+def builtin_append(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """append mylist value"""
+    if len(tokens) >= 3:
+        items = get_list(variables, tokens[1])
+        if items is not None:
+            items.append(get_val(tokens[2]))
+            return True
+    return False
+
+def builtin_prepend(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """prepend mylist value"""
+    if len(tokens) >= 3:
+        items = get_list(variables, tokens[1])
+        if items is not None:
+            items.insert(0, get_val(tokens[2]))
+            return True
+    return False
+
+def builtin_insert(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """insert mylist index value"""
+    if len(tokens) >= 4:
+        items = get_list(variables, tokens[1])
+        if items is not None:
+            index = get_val(tokens[2])
+            value = get_val(tokens[3])
+            if isinstance(index, int) and 0 <= index <= len(items):
+                items.insert(index, value)
+                return True
+    return False
+
+def builtin_remove(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """remove mylist index"""
+    if len(tokens) >= 3:
+        items = get_list(variables, tokens[1])
+        if items is not None:
+            index = get_val(tokens[2])
+            if isinstance(index, int) and 0 <= index < len(items):
+                items.pop(index)
+                return True
+    return False
+
+def builtin_listlength(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """listlength mylist result_var, also takes an array"""
+    if len(tokens) >= 3:
+        items = get_list(variables, tokens[1])
+        if items is None and isinstance(variables.get(tokens[1]), SpokeArray):
+            items = variables[tokens[1]]
+        if items is not None:
+            variables[tokens[2]] = len(items)
+            return True
+    return False
+
+def builtin_listclear(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """listclear mylist"""
+    if len(tokens) >= 2:
+        items = get_list(variables, tokens[1])
+        if items is not None:
+            items.clear()
+            return True
+    return False
+
+def builtin_contains(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """contains mylist value result_var, also takes a map (its keys) or a set"""
+    if len(tokens) >= 4:
+        value = get_val(tokens[2])
+        items = get_list(variables, tokens[1])
+        if items is None:
+            items = get_collection(variables, tokens[1])
+        if items is not None:
+            variables[tokens[3]] = value in items
+            return True
+    return False
+
+def builtin_index(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """index mylist value result_var, -1 when the value isn't in the list"""
+    if len(tokens) >= 4:
+        value = get_val(tokens[2])
+        items = get_list(variables, tokens[1])
+        if items is not None:
+            try:
+                variables[tokens[3]] = items.index(value)
+            except ValueError:
+                variables[tokens[3]] = -1
+            return True
+    return False
+
+def builtin_reverse(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """reverse mylist, also takes an array"""
+    if len(tokens) >= 2:
+        items = get_list(variables, tokens[1])
+        if items is None and isinstance(variables.get(tokens[1]), SpokeArray):
+            items = variables[tokens[1]]
+        if items is not None:
+            items.reverse()
+            return True
+    return False
+
+def builtin_sort(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """sort mylist, also takes an array"""
+    if len(tokens) < 2:
+        print(f"Error: 'sort' command requires 1 argument on line {lineNum}")
+        return False
+
+    list_name = tokens[1]
+    if list_name not in variables:
+        print(f"Error: Variable '{list_name}' does not exist on line {lineNum}")
+        return False
+    if not isinstance(variables[list_name], (list, SpokeArray)):
+        print(f"Error: Variable '{list_name}' is not a list on line {lineNum}")
+        return False
+
+    try:
+        variables[list_name].sort()
+        return True
+    except TypeError as te:
+        print(f"Error: Cannot sort list with mixed types on line {lineNum}: {te}")
+        return False
+
+def list_argument(variables, list_name, lineNum):
+    """The list or array stored in list_name, or None after saying why there isn't one"""
+    if list_name not in variables:
+        print(f"Error: Variable '{list_name}' does not exist on line {lineNum}")
+        return None
+    if not isinstance(variables[list_name], (list, SpokeArray)):
+        print(f"Error: Variable '{list_name}' is not a list or array on line {lineNum}")
+        return None
+    return variables[list_name]
+
+def store_list(variables, items, list_name, result_name):
+    """Put a bulk command's result in result_name, or back into the list or array it came from"""
+    if result_name is not None:
+        variables[result_name] = items
+    elif isinstance(items, SpokeArray):
+        variables[list_name].replace(items)
+    else:
+        variables[list_name][:] = items
+
+def builtin_range(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """range count mylist, range start stop mylist or range start stop step mylist"""
+    if not 3 <= len(tokens) <= 5:
+        print(f"Error: 'range' command requires a count and a list name on line {lineNum}")
+        return False
+    bounds = [get_val(token) for token in tokens[1:-1]]
+    if not all(type(bound) is int for bound in bounds):
+        print(f"Error: range bounds must be whole numbers on line {lineNum}")
+        return False
+    if len(bounds) == 3 and bounds[2] == 0:
+        print(f"Error: range step can't be 0 on line {lineNum}")
+        return False
+    variables[tokens[-1]] = list(range(*bounds))
+    return True
+
+def aggregate(tokens, variables, lineNum, combine):
+    """Shared body of sum, min and max: store combine(mylist) in result_var"""
+    command = tokens[0]
+    if len(tokens) < 3:
+        print(f"Error: '{command}' command requires 2 arguments on line {lineNum}")
+        return False
+    items = list_argument(variables, tokens[1], lineNum)
+    if items is None:
+        return False
+    if not items and combine is not sum:
+        print(f"Error: Cannot take the {command} of an empty list on line {lineNum}")
+        return False
+    try:
+        if isinstance(items, SpokeArray):
+            # Its own sum / min / max, run over its numbers without making a list
+            variables[tokens[2]] = getattr(items, command)()
+        else:
+            variables[tokens[2]] = combine(items)
+        return True
+    except TypeError as te:
+        print(f"Error: Cannot {command} list with mixed types on line {lineNum}: {te}")
+        return False
+
+def builtin_sum(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """sum mylist result_var"""
+    return aggregate(tokens, variables, lineNum, sum)
+
+def builtin_min(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """min mylist result_var"""
+    return aggregate(tokens, variables, lineNum, min)
+
+def builtin_max(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """max mylist result_var"""
+    return aggregate(tokens, variables, lineNum, max)
+
+def map_list(tokens, variables, get_val, lineNum):
+    """map mylist op operand [result_var] or map mylist function [result_var]"""
+    if len(tokens) < 3:
+        print(f"Error: 'map' command requires a list and an operator on line {lineNum}")
+        return False
+    items = list_argument(variables, tokens[1], lineNum)
+    if items is None:
+        return False
+    op = tokens[2]
+    if op in ITEM_FUNCTIONS:
+        operand, rest = None, tokens[3:]
+    elif op in BINARY_OPERATORS and len(tokens) >= 4:
+        operand, rest = get_val(tokens[3]), tokens[4:]
+    else:
+        print(f"Error: map needs one of {' '.join(BINARY_OPERATORS)} and a value, "
+              f"or one of {', '.join(ITEM_FUNCTIONS)} on line {lineNum}")
+        return False
+    try:
+        mapped = map_items(items, op, operand)
+    except (TypeError, ValueError, ArithmeticError) as e:
+        print(f"Error: Cannot map list on line {lineNum}: {e}")
+        return False
+    store_list(variables, mapped, tokens[1], rest[0] if rest else None)
+    return True
+
+def builtin_filter(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """filter mylist op value [result_var], keeping the items where item op value holds"""
+    if len(tokens) < 4 or tokens[2] not in COMPARE_OPERATORS:
+        print(f"Error: filter needs a list, one of {' '.join(COMPARE_OPERATORS)} and a value on line {lineNum}")
+        return False
+    items = list_argument(variables, tokens[1], lineNum)
+    if items is None:
+        return False
+    kept = filter_items(items, tokens[2], get_val(tokens[3]))
+    store_list(variables, kept, tokens[1], tokens[4] if len(tokens) >= 5 else None)
+    return True
+
+def builtin_reduce(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """reduce mylist op result_var, like sum with any of + - * / %"""
+    if len(tokens) < 4 or tokens[2] not in BINARY_OPERATORS:
+        print(f"Error: reduce needs a list, one of {' '.join(BINARY_OPERATORS)} and a result name on line {lineNum}")
+        return False
+    items = list_argument(variables, tokens[1], lineNum)
+    if items is None:
+        return False
+    if not items:
+        print(f"Error: Cannot reduce an empty list on line {lineNum}")
+        return False
+    try:
+        variables[tokens[3]] = reduce_items(items, tokens[2])
+        return True
+    except (TypeError, ValueError, ArithmeticError) as e:
+        print(f"Error: Cannot reduce list on line {lineNum}: {e}")
+        return False
+
+def builtin_unique(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """unique mylist [result_var]"""
+    if len(tokens) < 2:
+        print(f"Error: 'unique' command requires 1 argument on line {lineNum}")
+        return False
+    items = list_argument(variables, tokens[1], lineNum)
+    if items is None:
+        return False
+    store_list(variables, unique_items(items), tokens[1], tokens[2] if len(tokens) >= 3 else None)
+    return True
+
+def builtin_zip(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """zip first second result_var, a list of [first item, second item] pairs"""
+    if len(tokens) < 4:
+        print(f"Error: 'zip' command requires 3 arguments on line {lineNum}")
+        return False
+    first = list_argument(variables, tokens[1], lineNum)
+    second = list_argument(variables, tokens[2], lineNum) if first is not None else None
+    if second is None:
+        return False
+    variables[tokens[3]] = zip_items(first, second)
+    return True
+
+def get_collection(variables, name):
+    """The map or set stored in name, or None"""
+    if name in variables:
+        value = variables[name]
+        if is_collection(value):
+            return value
+    return None
+
+def assign_collection(variables, functions, line, convert):
+    """Shared body of map and set: evaluate the expression and store convert(value)"""
+    compiled = compiled_assignment(line, functions)
+    if isinstance(compiled, ExpressionError):
+        print(f"Invalid expression: {compiled}")
+        return False
+    name, evaluate = compiled
+    ok, value = run_expression(evaluate, variables, "Let operation error")
+    if not ok:
+        return False
+    value = convert(value)
+    if value is None:
+        return False
+    variables[name] = value
+    return True
+
+def builtin_map(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """map ages = {"ann": 31, "bob": 27}, or map mylist op operand [result_var] over a list"""
+    if len(tokens) < 3 or tokens[2] != "=":
+        return map_list(tokens, variables, get_val, lineNum)
+    return assign_collection(variables, functions, line, lambda value: value if isinstance(value, dict) else None)
+
+def builtin_set(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """set seen = {1, 2, 3}, set seen = mylist or set seen = {}"""
+    return assign_collection(variables, functions, line, make_set)
+
+def builtin_put(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """put mymap key value OR put myset value"""
+    container = get_collection(variables, tokens[1]) if len(tokens) >= 3 else None
+    if isinstance(container, dict) and len(tokens) == 4:
+        container[get_val(tokens[2])] = get_val(tokens[3])
+        return True
+    if isinstance(container, SpokeSet) and len(tokens) == 3:
+        container.add(get_val(tokens[2]))
+        return True
+    return False
+
+def builtin_get(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """get mymap key result_var [default], or get mylist index result_var [default]
+
+    result_var is set to default (None if not given) when there is no such item.
+    """
+    if len(tokens) in (4, 5) and tokens[1] in variables:
+        value = index_value(variables[tokens[1]], get_val(tokens[2]))
+        if value is None and len(tokens) == 5:
+            value = get_val(tokens[4])
+        variables[tokens[3]] = value
+        return True
+    return False
+
+def builtin_has(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """has mymap key result_var, for sets, lists and strings too"""
+    if len(tokens) == 4 and tokens[1] in variables:
+        variables[tokens[3]] = get_val(tokens[2]) in variables[tokens[1]]
+        return True
+    return False
+
+def builtin_keys(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """keys mymap result_var, the keys of a map or the values of a set as a list"""
+    if len(tokens) == 3:
+        container = get_collection(variables, tokens[1])
+        if container is not None:
+            variables[tokens[2]] = list(container)
+            return True
+    return False
+
+def builtin_memo(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """memo funcname OR memo funcname hits_var misses_var, how often a @memo function's cache was used"""
+    if len(tokens) not in (2, 4):
+        return False
+    function = functions.get(tokens[1])
+    if function is None or function['memo'] is None:
+        print(f"'{tokens[1]}' is not a @memo function")
+        return False
+    memo = function['memo']
+    if len(tokens) == 2:
+        print(memo.describe(tokens[1]))
+    else:
+        variables[tokens[2]] = memo.hits
+        variables[tokens[3]] = memo.misses
+    return True
+
+def builtin_return(tokens, variables, functions, get_val, errorLine, lineNum, line):
+    """return expression, only runs as a command when the expression is malformed"""
+    try:
+        parse_expression(line[len("return"):])
+    except ExpressionError as e:
+        print(f"Invalid expression: {e}")
+    return False
+
+def delete_key(variables, name, key):
+    """delete mymap key / delete myset value"""
+    container = get_collection(variables, name)
+    if container is None:
+        return False
+    if key not in container:
+        print("Key not found")
+        return False
+    if isinstance(container, dict):
+        del container[key]
+    else:
+        container.remove(key)
+    return True
+
+BUILTIN_COMMANDS = {
+    "let": builtin_let,
+    "math": builtin_math,
+    "print": builtin_print,
+    "inc": builtin_inc,
+    "dec": builtin_dec,
+    "delete": builtin_delete,
+    "swap": builtin_swap,
+    "toggle": builtin_toggle,
+    "list": builtin_list,
+    "array": builtin_array,
+    "append": builtin_append,
+    "prepend": builtin_prepend,
+    "insert": builtin_insert,
+    "remove": builtin_remove,
+    "listlength": builtin_listlength,
+    "listclear": builtin_listclear,
+    "contains": builtin_contains,
+    "index": builtin_index,
+    "reverse": builtin_reverse,
+    "sort": builtin_sort,
+    "range": builtin_range,
+    "sum": builtin_sum,
+    "min": builtin_min,
+    "max": builtin_max,
+    "filter": builtin_filter,
+    "reduce": builtin_reduce,
+    "unique": builtin_unique,
+    "zip": builtin_zip,
+    "map": builtin_map,
+    "set": builtin_set,
+    "put": builtin_put,
+    "get": builtin_get,
+    "has": builtin_has,
+    "keys": builtin_keys,
+    "memo": builtin_memo,
+    "return": builtin_return,
+}
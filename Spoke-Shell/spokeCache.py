@@ -0,0 +1,96 @@
+"""
+On-disk cache of parsed programs, like Python's __pycache__.
+
+Running dir/script.spk stores the parsed script in dir/__spokecache__/script.spkc.
+The file starts with the interpreter version and a hash of the source, and is
+only used while both still match, so editing the script or the parser makes
+the next run parse from scratch again. spokeExpr and spokeTokens count as part
+of the parser.
+"""
+import hashlib
+import os
+import pickle
+import sys
+from pathlib import Path
+
+import spokeExpr
+import spokeParser
+import spokeTokens
+from spokeParser import parse_program
+
+CACHE_DIR = "__spokecache__"
+CACHE_SUFFIX = ".spkc"
+
+_interpreter_version = None
+
+def interpreter_version():
+    """Changes whenever the parser or Python changes, and with them the cached format"""
+    global _interpreter_version
+    if _interpreter_version is None:
+        digest = hashlib.sha256(Path(spokeParser.__file__).read_bytes())
+        # Conditions are stored as expression trees
+        digest.update(Path(spokeExpr.__file__).read_bytes())
+        # Lines are tokenized with its regexes, like FLAT_LIST and TABLE
+        digest.update(Path(spokeTokens.__file__).read_bytes())
+        digest.update(sys.version.encode())
+        _interpreter_version = digest.hexdigest()
+    return _interpreter_version
+
+def source_hash(source):
+    return hashlib.sha256(source.encode()).hexdigest()
+
+def cache_path(filename):
+    """Where the cached form of a .spk file lives"""
+    path = Path(filename)
+    return path.parent / CACHE_DIR / (path.stem + CACHE_SUFFIX)
+
+def read_cache(path, key):
+    """The cached nodes at path, or (None, reason they can't be used)"""
+    try:
+        with open(path, "rb") as f:
+            # The header is a separate pickle so stale files aren't loaded any further
+            header = pickle.load(f)
+            if header != key:
+                if header[0] != key[0]:
+                    return None, "interpreter changed"
+                return None, "source changed"
+            return pickle.load(f), None
+    except FileNotFoundError:
+        return None, "not cached"
+    except Exception as e:
+        return None, f"unreadable ({e})"
+
+def write_cache(path, key, nodes):
+    """Store nodes at path, written to a temporary file first so readers never see half a file"""
+    path.parent.mkdir(exist_ok=True)
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, "wb") as f:
+            pickle.dump(key, f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(nodes, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+def load_program(filename, source, verbose=False):
+    """Parse the source of filename, or load it from the cache if neither has changed"""
+    path = cache_path(filename)
+    key = (interpreter_version(), source_hash(source))
+
+    nodes, reason = read_cache(path, key)
+    if nodes is not None:
+        if verbose:
+            print(f"Cache hit: {path}", file=sys.stderr)
+        return nodes
+
+    if verbose:
+        print(f"Cache miss: {path}, {reason}", file=sys.stderr)
+    nodes = parse_program(source)
+    try:
+        write_cache(path, key, nodes)
+    except (OSError, pickle.PicklingError, RecursionError) as e:
+        # A read-only folder just means parsing every time
+        if verbose:
+            print(f"Could not write {path}: {e}", file=sys.stderr)
+    return nodes
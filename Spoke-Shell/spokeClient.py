@@ -0,0 +1,116 @@
+"""
+Client for the Spoke job server in spokeServer.py.
+
+    python spoke.py submit [--socket=PATH | --port=PORT] [--timeout=SECONDS] [--input=FILE] <file.spk | ->
+    python spoke.py submit --stats
+
+Sends the script (or its source, - reads it from stdin) to the server, prints
+its output as it arrives and exits with 1 if the job failed or timed out.
+Kept apart from the server so submitting a job doesn't import the interpreter.
+
+Every request carries the token the server wrote to runtime_dir()/token, which
+only the user running the server can read, so other users can't run jobs.
+"""
+import json
+import os
+import socket
+import sys
+import tempfile
+
+DEFAULT_PORT = 7878
+
+def runtime_dir():
+    """This user's directory for the server's socket and token"""
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"], "spoke")
+    user = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+    return os.path.join(tempfile.gettempdir(), f"spoke-{user}")
+
+def default_socket():
+    return os.path.join(runtime_dir(), "spoke.sock")
+
+def token_path():
+    return os.path.join(runtime_dir(), "token")
+
+def read_token():
+    """The server's token, or None when no server has written one"""
+    try:
+        with open(token_path(), "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def parse_options(argv):
+    """--name=value options and the remaining arguments"""
+    options = {}
+    args = []
+    for arg in argv:
+        if arg.startswith("--"):
+            name, _, value = arg[2:].partition("=")
+            options[name] = value
+        else:
+            args.append(arg)
+    return options, args
+
+def uses_tcp(options):
+    return "port" in options or not hasattr(socket, "AF_UNIX")
+
+def connect(options):
+    if uses_tcp(options):
+        return socket.create_connection(("127.0.0.1", int(options.get("port") or DEFAULT_PORT)))
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(options.get("socket") or default_socket())
+    return sock
+
+def request(options, message):
+    """Send one request, yields every message the server answers with"""
+    message = dict(message, token=read_token())
+    with connect(options) as sock:
+        sock.sendall(json.dumps(message).encode() + b"\n")
+        with sock.makefile("r", encoding="utf-8") as replies:
+            for reply in replies:
+                yield json.loads(reply)
+
+def submit(argv):
+    """python spoke.py submit, returns the exit status"""
+    options, args = parse_options(argv)
+
+    if "stats" in options:
+        for stats in request(options, {"stats": True}):
+            print(f"Workers: {stats['workers']}, up {stats['uptime']:.0f}s")
+            print(f"Jobs: {stats['jobs']} ({stats['ok']} ok, {stats['failed']} failed, {stats['timed_out']} timed out)")
+            print(f"Throughput: {stats['jobs_per_sec']:.2f} jobs/s, {stats['mean_job_ms']:.1f} ms per job")
+        return 0
+
+    if len(args) != 1:
+        print("Usage: python spoke.py submit [--socket=PATH | --port=PORT] [--timeout=SECONDS] [--input=FILE] <file.spk | ->")
+        return 2
+
+    # Relative paths in the script mean the same files as with python spoke.py file.spk
+    job = {"cwd": os.getcwd()}
+    if args[0] == "-":
+        job["source"] = sys.stdin.read()
+    else:
+        job["path"] = os.path.abspath(args[0])
+    if options.get("input"):
+        with open(options["input"], "r") as f:
+            job["input"] = f.read()
+    if options.get("timeout"):
+        job["timeout"] = float(options["timeout"])
+
+    result = {}
+    try:
+        for message in request(options, job):
+            if "output" in message:
+                sys.stdout.write(message["output"])
+                sys.stdout.flush()
+            else:
+                result = message
+    except BrokenPipeError:
+        # Whatever reads our output stopped reading
+        return 1
+    if result.get("timed_out"):
+        print(f"Job timed out after {result['elapsed']:.1f}s", file=sys.stderr)
+    elif result.get("error"):
+        print(f"Error: {result['error']}", file=sys.stderr)
+    return 0 if result.get("ok") else 1
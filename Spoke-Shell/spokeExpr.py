@@ -0,0 +1,440 @@
+"""
+Expressions shared by let, math and if / while conditions.
+
+    let area = 3.14 * r * r
+    math (a + b) / 2 loud average
+    if (len(items) >= 3 and not sqrt(x) << 2) then {
+    map ages = {"ann": 31, "bob": 27}
+    return fib(n - 1) + fib(n - 2)
+
+parse_expression turns the text into a tree of tuples once, compile_expression
+turns the tree into a function of the current variables. Callers keep the
+compiled function for each line, so a line inside a loop is only parsed the
+first time it runs.
+
+A call to a name that isn't one of EXPRESSION_FUNCTIONS calls the Spoke
+function of that name and stands for its return value.
+
+From lowest to highest precedence:
+
+    and / or            read left to right, like conditions always have been
+    not
+    == != << >> <= >= =< =>
+    + -
+    * / %
+    unary -
+    calls, list[index], list[start:stop], (...), [list, literal], {"map": literal},
+    {set, literal}, numbers, strings and names
+"""
+import math
+import operator
+import re
+from spokeTypes import SpokeArray, SpokeSet
+from spokeFunctions import call_function
+from spokeTokens import number_value
+
+# Comparison operators, numeric strings compare as numbers
+COMPARE_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<<": operator.lt,
+    ">>": operator.gt,
+    "<=": operator.le,
+    "=<": operator.le,
+    ">=": operator.ge,
+    "=>": operator.ge,
+}
+
+BINARY_OPERATORS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "%": operator.mod,
+}
+
+def spoke_len(value):
+    """Items in a list, characters in anything else"""
+    try:
+        return len(value)
+    except TypeError:
+        return len(str(value))
+
+# Functions expressions can call
+EXPRESSION_FUNCTIONS = {
+    "sqrt": math.sqrt,
+    "len": spoke_len,
+    "abs": abs,
+    "min": min,
+    "max": max,
+    "round": round,
+    "floor": math.floor,
+    "ceil": math.ceil,
+    "int": int,
+    "float": float,
+    "str": str,
+    "has": lambda container, key: key in container,
+    "keys": list,
+    # What list[start:stop] reads as
+    "slice": slice,
+}
+
+TOKEN_PATTERN = re.compile(r"""\s*(?:
+    (?P<number>\d+\.?\d*)
+  | (?P<string>"[^"]*"|'[^']*')
+  | (?P<name>\w+)
+  | (?P<op>==|!=|<<|>>|<=|>=|=<|=>|[-+*/%()\[\]{}:,])
+)""", re.VERBOSE)
+
+class ExpressionError(ValueError):
+    """Raised for text that isn't a valid expression"""
+
+def to_number(val):
+    """Numeric strings compare as numbers"""
+    if isinstance(val, str):
+        number = number_value(val)
+        if number is not None:
+            return number
+    return val
+
+def compare_values(first, second, op, op_func):
+    """first op second, values of types that can't be ordered are never less or greater"""
+    try:
+        return op_func(first, second)
+    except TypeError:
+        if op == "==":
+            return False
+        elif op == "!=":
+            return True
+        print(f"DEBUG: Cannot compare types for operator {op}")
+        return False
+
+def malformed_condition(lineNum):
+    """What an if / while condition that can't be parsed stands for: false, with a warning"""
+    print(f"DEBUG: Malformed condition on line {lineNum}, treated as false")
+    return False
+
+def index_value(container, index):
+    """container[index] the way get_val reads list items and map values, None when there is no such item
+
+    index can be a slice, for list[start:stop].
+    """
+    if isinstance(container, dict):
+        return container.get(index)
+    if isinstance(container, (list, str, SpokeArray)):
+        if isinstance(index, int) and -len(container) <= index < len(container):
+            return container[index]
+        if isinstance(index, slice):
+            return container[index]
+    return None
+
+def tokenize_expression(text):
+    """(kind, text) pairs, kind is number, string, name or op"""
+    tokens = []
+    pos = 0
+    end = len(text.rstrip())
+    while pos < end:
+        match = TOKEN_PATTERN.match(text, pos)
+        if match is None:
+            raise ExpressionError(f"unexpected '{text[pos:].strip()[0]}'")
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        pos = match.end()
+    return tokens
+
+class ExpressionParser:
+    """Recursive descent over the tokens of one expression"""
+
+    def __init__(self, text):
+        self.tokens = tokenize_expression(text)
+        self.pos = 0
+
+    def peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos][1]
+        return None
+
+    def take(self):
+        if self.pos >= len(self.tokens):
+            raise ExpressionError("expression ends too early")
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def expect(self, text):
+        if self.peek() != text:
+            raise ExpressionError(f"expected '{text}'")
+        self.pos += 1
+
+    def parse(self):
+        if not self.tokens:
+            raise ExpressionError("empty expression")
+        tree = self.logic()
+        if self.pos < len(self.tokens):
+            raise ExpressionError(f"unexpected '{self.peek()}'")
+        return tree
+
+    def logic(self):
+        tree = self.negation()
+        while self.peek() in ("and", "or"):
+            joiner = self.take()[1]
+            tree = (joiner, tree, self.negation())
+        return tree
+
+    def negation(self):
+        if self.peek() != "not":
+            return self.comparison()
+        self.pos += 1
+        operand = self.negation()
+        if operand[0] == "compare":
+            # not a == b flips the comparison itself
+            return operand[:4] + (not operand[4],)
+        return ("not", operand)
+
+    def comparison(self):
+        tree = self.sum()
+        if self.peek() in COMPARE_OPERATORS:
+            op = self.take()[1]
+            tree = ("compare", op, tree, self.sum(), False)
+        return tree
+
+    def sum(self):
+        tree = self.term()
+        while self.peek() in ("+", "-"):
+            tree = fold_binary(self.take()[1], tree, self.term())
+        return tree
+
+    def term(self):
+        tree = self.unary()
+        while self.peek() in ("*", "/", "%"):
+            tree = fold_binary(self.take()[1], tree, self.unary())
+        return tree
+
+    def unary(self):
+        if self.peek() == "-":
+            self.pos += 1
+            operand = self.unary()
+            if operand[0] == "const" and isinstance(operand[1], (int, float)):
+                return ("const", -operand[1])
+            return ("neg", operand)
+        if self.peek() == "+":
+            self.pos += 1
+            return self.unary()
+        return self.postfix()
+
+    def postfix(self):
+        tree = self.primary()
+        while self.peek() == "[":
+            self.pos += 1
+            index = ("const", None) if self.peek() == ":" else self.logic()
+            if self.peek() == ":":
+                # list[start:stop], either bound can be left out
+                self.pos += 1
+                stop = ("const", None) if self.peek() == "]" else self.logic()
+                index = ("call", "slice", [index, stop])
+            tree = ("index", tree, index)
+            self.expect("]")
+        return tree
+
+    def primary(self):
+        kind, text = self.take()
+        if kind == "number":
+            return ("const", float(text) if '.' in text else int(text))
+        if kind == "string":
+            return ("const", text[1:-1])
+        if kind == "name":
+            if text in ("and", "or", "not"):
+                raise ExpressionError(f"unexpected '{text}'")
+            if self.peek() == "(":
+                self.pos += 1
+                if text not in EXPRESSION_FUNCTIONS:
+                    # A Spoke function, looked up when the call runs
+                    return ("function", text, self.items(")"))
+                return ("call", text, self.items(")"))
+            return ("name", text)
+        if text == "(":
+            tree = self.logic()
+            self.expect(")")
+            return tree
+        if text == "[":
+            return ("list", self.items("]"))
+        if text == "{":
+            return self.braces()
+        raise ExpressionError(f"unexpected '{text}'")
+
+    def items(self, closing):
+        """Comma separated expressions up to closing, for call arguments and list literals"""
+        items = []
+        while self.peek() != closing:
+            items.append(self.logic())
+            if self.peek() != closing:
+                self.expect(",")
+        self.pos += 1
+        return items
+
+    def braces(self):
+        """{key: value, ...} is a map, {value, ...} a set and {} an empty map"""
+        if self.peek() == "}":
+            self.pos += 1
+            return ("map", [])
+        first = self.logic()
+        if self.peek() != ":":
+            if self.peek() != "}":
+                self.expect(",")
+            return ("set", [first] + self.items("}"))
+
+        pairs = []
+        key = first
+        while True:
+            self.expect(":")
+            pairs.append((key, self.logic()))
+            if self.peek() != "}":
+                self.expect(",")
+            if self.peek() == "}":
+                self.pos += 1
+                return ("map", pairs)
+            key = self.logic()
+
+def fold_binary(op, left, right):
+    """A binary node, or its value when both sides are numbers"""
+    if left[0] == "const" and right[0] == "const":
+        try:
+            return ("const", BINARY_OPERATORS[op](left[1], right[1]))
+        except Exception:
+            # Reported when the line runs
+            pass
+    return ("binary", op, left, right)
+
+def parse_expression(text):
+    """Parse expression text into a tree, raises ExpressionError if it's malformed"""
+    return ExpressionParser(text).parse()
+
+ASSIGNMENT_PATTERN = re.compile(r"\w+\s+(\w+)\s*=(?!=)(.*)$")
+MATH_PATTERN = re.compile(r"math\s+(.*?)(?:\s+(silent|loud)(?:\s+(\w+))?)?\s*$")
+
+def parse_assignment(line):
+    """let / map / set var = expression -> (var, tree)"""
+    match = ASSIGNMENT_PATTERN.match(line)
+    if match is None:
+        raise ExpressionError("expected name = expression")
+    return match.group(1), parse_expression(match.group(2))
+
+def parse_math(line):
+    """math expression [silent / loud] [var] -> (tree, loud, var or None)"""
+    match = MATH_PATTERN.match(line)
+    if match is None:
+        raise ExpressionError("expected math expression")
+    return parse_expression(match.group(1)), match.group(2) != "silent", match.group(3)
+
+def compile_expression(tree, functions=None):
+    """A function of the current variables that returns the value of tree
+
+    Names that aren't variables evaluate to themselves, the same as get_val.
+    functions is the interpreter's functions dict, for calls to Spoke functions.
+    """
+    kind = tree[0]
+    if kind == "const":
+        value = tree[1]
+        return lambda variables: value
+
+    if kind == "name":
+        name = tree[1]
+        return lambda variables: variables.get(name, name)
+
+    if kind == "binary":
+        _, op, left, right = tree
+        op_func = BINARY_OPERATORS[op]
+        # Loading names and constants directly saves a call for the common a + 1 / a + b
+        if left[0] == "name" and right[0] == "const":
+            name, value = left[1], right[1]
+            return lambda variables: op_func(variables.get(name, name), value)
+        if left[0] == "name" and right[0] == "name":
+            first, second = left[1], right[1]
+            return lambda variables: op_func(variables.get(first, first), variables.get(second, second))
+        load_left = compile_expression(left, functions)
+        if right[0] == "const":
+            value = right[1]
+            return lambda variables: op_func(load_left(variables), value)
+        load_right = compile_expression(right, functions)
+        return lambda variables: op_func(load_left(variables), load_right(variables))
+
+    if kind == "compare":
+        _, op, left, right, negate = tree
+        op_func = COMPARE_OPERATORS[op]
+        load_left = compile_expression(left, functions)
+        if right[0] == "const":
+            value = to_number(right[1])
+            def comparison(variables):
+                result = compare_values(to_number(load_left(variables)), value, op, op_func)
+                return not result if negate else result
+        else:
+            load_right = compile_expression(right, functions)
+            def comparison(variables):
+                result = compare_values(to_number(load_left(variables)), to_number(load_right(variables)), op, op_func)
+                return not result if negate else result
+        return comparison
+
+    if kind == "and":
+        left = compile_expression(tree[1], functions)
+        right = compile_expression(tree[2], functions)
+        return lambda variables: left(variables) and right(variables)
+
+    if kind == "or":
+        left = compile_expression(tree[1], functions)
+        right = compile_expression(tree[2], functions)
+        return lambda variables: left(variables) or right(variables)
+
+    if kind == "not":
+        operand = compile_expression(tree[1], functions)
+        return lambda variables: not operand(variables)
+
+    if kind == "neg":
+        operand = compile_expression(tree[1], functions)
+        return lambda variables: -operand(variables)
+
+    if kind == "call":
+        function = EXPRESSION_FUNCTIONS[tree[1]]
+        loaders = [compile_expression(arg, functions) for arg in tree[2]]
+        if len(loaders) == 1:
+            load = loaders[0]
+            return lambda variables: function(load(variables))
+        return lambda variables: function(*[load(variables) for load in loaders])
+
+    if kind == "function":
+        name = tree[1]
+        loaders = [compile_expression(arg, functions) for arg in tree[2]]
+        return lambda variables: call_function(functions, name, [load(variables) for load in loaders])
+
+    if kind == "index":
+        load_target = compile_expression(tree[1], functions)
+        load_index = compile_expression(tree[2], functions)
+        return lambda variables: index_value(load_target(variables), load_index(variables))
+
+    if kind == "list":
+        loaders = [compile_expression(item, functions) for item in tree[1]]
+        return lambda variables: [load(variables) for load in loaders]
+
+    if kind == "map":
+        loaders = [(compile_expression(key, functions), compile_expression(value, functions)) for key, value in tree[1]]
+        return lambda variables: {load_key(variables): load_value(variables) for load_key, load_value in loaders}
+
+    if kind == "set":
+        loaders = [compile_expression(item, functions) for item in tree[1]]
+        return lambda variables: SpokeSet([load(variables) for load in loaders])
+
+    raise ExpressionError(f"unknown expression node {kind}")
+
+def calls_functions(tree):
+    """Whether an expression tree calls a Spoke function, so its compiled form depends on the functions dict"""
+    if isinstance(tree, (tuple, list)):
+        return (len(tree) > 0 and tree[0] == "function") or any(calls_functions(part) for part in tree)
+    return False
+
+def run_expression(evaluate, variables, error_prefix):
+    """Evaluate a compiled expression for let / math, returns (ok, result) and prints what went wrong"""
+    try:
+        return True, evaluate(variables)
+    except ZeroDivisionError:
+        print("Error: Division by zero")
+    except Exception as e:
+        print(f"{error_prefix}: {e}")
+    return False, None
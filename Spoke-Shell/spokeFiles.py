@@ -0,0 +1,240 @@
+"""
+Reading text files line by line without loading them whole, for the read
+command and foreach loops, and buffered writing for save and open / write.
+
+    read big log 50000 x
+    foreach line in big.log {
+    open out report txt
+    write out line
+
+The first read of a file scans it once and keeps the byte offset where every
+line starts, so any line after that is a single slice. Files up to
+MMAP_THRESHOLD bytes are kept in memory as bytes, bigger ones are mapped with
+mmap and only the pages that are read are loaded. The index is rebuilt when
+the file's size or modification time changes, so reading a file that the
+script is writing to stays correct.
+
+Files written by save or through a handle from open stay open with a
+WRITE_BUFFER byte buffer, so writing a line costs a copy into the buffer
+instead of opening and closing the file. Everything buffered is flushed
+before the file is read.
+
+Every Interpreter keeps its indexes and writers in its own Files, which
+run_program makes the current one while the script runs, for the read,
+save and open commands to find with current_files(). When a script ends,
+also when it stops on an error, every file it wrote to is closed and every
+kept index is dropped. A shell or server running many scripts in one process
+would otherwise keep writing to handles of files that have since been
+deleted or replaced, and keep them locked on Windows.
+"""
+import io
+import mmap
+import os
+from array import array
+from collections import OrderedDict
+from contextvars import ContextVar
+from itertools import accumulate
+
+# How files are decoded and encoded, by read, foreach, save and write alike,
+# whatever the locale
+ENCODING = "utf-8"
+# Files at least this big are memory mapped instead of read into memory
+MMAP_THRESHOLD = 1 << 20
+# Most files whose index is kept, the least recently read is dropped first
+MAX_INDEXES = 32
+# Bytes written to a file are kept until this many are waiting
+WRITE_BUFFER = 1 << 16
+# Most files kept open for writing, the least recently opened is closed first.
+# 0 closes a file again after every save
+MAX_WRITERS = 32
+
+class LineIndex:
+    """The contents of one file and the offset every line starts at"""
+    __slots__ = ("stamp", "data", "offsets")
+
+    def __init__(self, path, stamp):
+        self.stamp = stamp
+        with open(path, "rb") as f:
+            if stamp[1] >= MMAP_THRESHOLD:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                reader = self.data
+            else:
+                self.data = f.read()
+                reader = io.BytesIO(self.data)
+            # offsets[n] is where line n + 1 starts, the last entry is the end of the file
+            self.offsets = array("q", accumulate(map(len, iter(reader.readline, b"")), initial=0))
+        if isinstance(self.data, mmap.mmap):
+            self.data.seek(0)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def line(self, number):
+        """Line number (counting from 1) without its line ending"""
+        raw = self.data[self.offsets[number - 1]:self.offsets[number]]
+        return raw.decode(ENCODING).rstrip("\r\n")
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+class Writer:
+    """A file open for writing, what open stores in a variable
+
+    When more than MAX_WRITERS files are open the least recently opened one is
+    parked: its file is closed and opened again in append mode by its next
+    write, so that only costs the script time. A parked Writer stays in its
+    Files, so opening or saving to its file again still uses it. After close,
+    by the script or when the script ends, it can't be written to.
+    """
+    __slots__ = ("files", "path", "file", "closed")
+
+    def __init__(self, files, path, mode):
+        self.files = files
+        self.path = path
+        self.file = open(path, mode, buffering=WRITE_BUFFER, encoding=ENCODING)
+        self.closed = False
+
+    def write(self, text):
+        if self.file is None:
+            if self.closed:
+                raise ValueError(f"{self.path} is closed")
+            self.file = open(self.path, "a", buffering=WRITE_BUFFER, encoding=ENCODING)
+            self.files.keep_open(self)
+        self.file.write(text)
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def park(self):
+        """Close the file until the next write"""
+        if self.file is not None:
+            file, self.file = self.file, None
+            self.files.open_writers.pop(os.path.abspath(self.path), None)
+            file.close()
+
+    def close(self):
+        self.park()
+        self.closed = True
+        writers = self.files.writers
+        if writers.get(os.path.abspath(self.path)) is self:
+            del writers[os.path.abspath(self.path)]
+
+    def __repr__(self):
+        return f"<file {self.path}>"
+
+class Files:
+    """The line indexes and writers of one Interpreter"""
+
+    def __init__(self):
+        # path -> LineIndex, least recently used first
+        self.indexes = OrderedDict()
+        # absolute path -> Writer, for every file written to and not closed
+        self.writers = {}
+        # absolute path -> Writer whose file is open, least recently opened first
+        self.open_writers = OrderedDict()
+
+    def line_index(self, path):
+        """The LineIndex of path, scanning the file on first use or when it has changed"""
+        if self.writers:
+            self.flush_file(path)
+        info = os.stat(path)
+        stamp = (info.st_mtime_ns, info.st_size)
+        indexes = self.indexes
+        index = indexes.get(path)
+        if index is not None and index.stamp == stamp:
+            indexes.move_to_end(path)
+            return index
+
+        if index is not None:
+            index.close()
+        index = indexes[path] = LineIndex(path, stamp)
+        indexes.move_to_end(path)
+        if len(indexes) > MAX_INDEXES:
+            indexes.popitem(last=False)[1].close()
+        return index
+
+    def read_line(self, path, number):
+        """Line number of the file at path, None if the file has no such line"""
+        index = self.line_index(path)
+        if not 1 <= number <= len(index):
+            return None
+        return index.line(number)
+
+    def stream_lines(self, path):
+        """Every line of the file at path without its line ending, read as the loop goes
+
+        The file is opened straight away, so a missing file is reported before
+        the loop starts.
+        """
+        if self.writers:
+            self.flush_file(path)
+        # Only \n ends a line and \r\n is stripped whole, the same as LineIndex
+        file = open(path, "r", encoding=ENCODING, newline="\n")
+
+        def lines():
+            with file:
+                for line in file:
+                    yield line.rstrip("\r\n")
+        return lines()
+
+    def keep_open(self, writer):
+        """Add writer to open_writers, parking the oldest when there are too many"""
+        open_writers = self.open_writers
+        open_writers[os.path.abspath(writer.path)] = writer
+        while len(open_writers) > max(MAX_WRITERS, 1):
+            open_writers.popitem(last=False)[1].park()
+
+    def open_file(self, path, overwrite=False):
+        """The Writer for path, shared by every handle and save on the same file
+
+        With overwrite the file is emptied first, otherwise writes are added to
+        the end of it.
+        """
+        writer = self.writers.get(os.path.abspath(path))
+        if writer is None:
+            writer = self.writers[os.path.abspath(path)] = Writer(self, path, "w" if overwrite else "a")
+            self.keep_open(writer)
+        elif overwrite:
+            writer.park()
+            writer.file = open(path, "w", buffering=WRITE_BUFFER, encoding=ENCODING)
+            self.keep_open(writer)
+        return writer
+
+    def append_text(self, path, text):
+        """What save does: add text to the end of the file at path"""
+        writer = self.writers.get(os.path.abspath(path))
+        if writer is None:
+            if not MAX_WRITERS:
+                with open(path, "a", encoding=ENCODING) as f:
+                    f.write(text)
+                return
+            writer = self.open_file(path)
+        writer.write(text)
+
+    def flush_file(self, path):
+        """Write out what is buffered for path, so reading it sees everything saved"""
+        writer = self.writers.get(os.path.abspath(path))
+        if writer is not None:
+            writer.flush()
+
+    def flush(self):
+        """Write out everything buffered"""
+        for writer in list(self.writers.values()):
+            writer.flush()
+
+    def close(self):
+        """Close every file kept open for writing and drop every kept index, for when a script ends"""
+        for writer in list(self.writers.values()):
+            writer.close()
+        for index in self.indexes.values():
+            index.close()
+        self.indexes.clear()
+
+# The Files of the interpreter whose script is running, set by run_program
+CURRENT_FILES = ContextVar("spoke_files")
+
+def current_files():
+    """The Files the running script reads and writes through"""
+    return CURRENT_FILES.get()
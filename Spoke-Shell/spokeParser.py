@@ -0,0 +1,338 @@
+import re
+from spokeExpr import ExpressionError, parse_expression
+from spokeTokens import FLAT_LIST, TABLE, list_ends, token_type
+
+# Strings, the [ that opens a list literal, numbers, comparison operators, words and single symbols
+TOKEN_PATTERN = re.compile(r'"[^"]*"|\'[^\']*\'|\[|-?\d+\.?\d*|<<|>>|<=|>=|==|!=|=<|=>|\w+|[=+*/()%<>{}:!@#$%^&-]')
+# @memo or @memo maxsize=N above a function
+MEMO_PATTERN = re.compile(r"@memo(?:\s+maxsize\s*=\s*(\d+))?$")
+# foreach line in path {, the path can have dots and slashes the tokenizer drops
+FOREACH_PATTERN = re.compile(r"foreach\s+(\w+)\s+in\s+(.+?)\s*\{$")
+
+def tokenize(line):
+    """Split a line into tokens, noting what kind of value each is (see spokeTokens.py)"""
+    tokens = TOKEN_PATTERN.findall(line) if "[" not in line else tokenize_lists(line)
+    for token in tokens:
+        token_type(token)
+    return tokens
+
+def tokenize_lists(line):
+    """tokenize for a line with a [ in it, every list literal is one token however deeply it nests"""
+    tokens = []
+    pos = 0
+    ends = None
+    while True:
+        match = TOKEN_PATTERN.search(line, pos)
+        if match is None:
+            return tokens
+        pos = match.end()
+        if match.group() == "[":
+            # Flat lists and tables are matched whole, anything else bracket by bracket
+            whole = FLAT_LIST.match(line, match.start()) or TABLE.match(line, match.start())
+            if whole:
+                end = whole.end()
+            else:
+                if ends is None:
+                    ends = list_ends(line, match.start())
+                end = ends.get(match.start())
+            if end is None:
+                # A [ that is never closed isn't a token
+                continue
+            tokens.append(line[match.start():end])
+            pos = end
+        else:
+            tokens.append(match.group())
+
+def restore_node(cls, values):
+    """Rebuild a node from its slot values, used when loading a cached program"""
+    node = cls.__new__(cls)
+    for name, value in zip(cls.__slots__, values):
+        setattr(node, name, value)
+    return node
+
+class Node:
+    """Base of the statement nodes
+
+    Nodes pickle as their class and slot values, which loads about twice as
+    fast as pickle's default handling of __slots__ (see spokeCache.py).
+    """
+    __slots__ = ()
+
+    def __reduce__(self):
+        return (restore_node, (type(self), tuple(getattr(self, name) for name in self.__slots__)))
+
+class Statement(Node):
+    """A single command line, or a call to a Spoke function"""
+    __slots__ = ("lineno", "line", "tokens", "call_args")
+
+    def __init__(self, lineno, line, tokens):
+        self.lineno = lineno
+        self.line = line
+        self.tokens = tokens
+        # Argument tokens for name(a, b) style lines, None if the line isn't shaped like a call
+        self.call_args = None
+        if len(tokens) >= 3 and tokens[1] == "(" and ")" in tokens:
+            self.call_args = [token for token in tokens[2:tokens.index(")")] if token != ","]
+
+class FunctionDef(Node):
+    """function name(params) { body }
+
+    memo is None, or the most results a @memo line above the function keeps,
+    0 for no limit (see spokeFunctions.py).
+    """
+    __slots__ = ("lineno", "line", "name", "params", "body", "memo")
+
+    def __init__(self, lineno, line, name, params, body, memo=None):
+        self.lineno = lineno
+        self.line = line
+        self.name = name
+        self.params = params
+        self.body = body
+        self.memo = memo
+
+class Return(Node):
+    """return expression, or a bare return, whose value is ("const", None)"""
+    __slots__ = ("lineno", "line", "value")
+
+    def __init__(self, lineno, line, value):
+        self.lineno = lineno
+        self.line = line
+        self.value = value
+
+class Branch(Node):
+    """One if / else if / else block; condition is None for a plain else
+
+    test is the condition parsed by parse_test, None if it's malformed.
+    """
+    __slots__ = ("lineno", "line", "condition", "test", "body")
+
+    def __init__(self, lineno, line, condition, body):
+        self.lineno = lineno
+        self.line = line
+        self.condition = condition
+        self.test = parse_test(line) if condition is not None else None
+        self.body = body
+
+class IfChain(Node):
+    """An if statement with all of its else if / else branches"""
+    __slots__ = ("lineno", "line", "branches")
+
+    def __init__(self, lineno, line, branches):
+        self.lineno = lineno
+        self.line = line
+        self.branches = branches
+
+class WhileLoop(Node):
+    """while (condition) then { body }"""
+    __slots__ = ("lineno", "line", "condition", "test", "body")
+
+    def __init__(self, lineno, line, condition, body):
+        self.lineno = lineno
+        self.line = line
+        self.condition = condition
+        self.test = parse_test(line)
+        self.body = body
+
+class ForLoop(Node):
+    """for var in range (...) { body }, for var in list { body }, repeat count { body }
+    or foreach var in file { body }
+
+    range_args holds the tokens inside range (...), or the count of a repeat loop,
+    source is the token of the list or string to loop over, and file the path
+    text of a foreach loop, which reads the file a line at a time. var is None
+    for repeat loops.
+    """
+    __slots__ = ("lineno", "line", "var", "range_args", "source", "body", "file")
+
+    def __init__(self, lineno, line, var, range_args, source, body, file=None):
+        self.lineno = lineno
+        self.line = line
+        self.var = var
+        self.range_args = range_args
+        self.source = source
+        self.body = body
+        self.file = file
+
+def parse_return(line):
+    """A Return node's value, None if the expression is malformed"""
+    text = line[len("return"):]
+    if not text.strip():
+        return ("const", None)
+    try:
+        return parse_expression(text)
+    except ExpressionError:
+        return None
+
+def parse_test(line):
+    """The condition between the parentheses of an if / else if / while line
+    as an expression tree (see spokeExpr.py), None if it's malformed"""
+    start = line.find("(")
+    end = line.rfind(")")
+    if start < 0 or end <= start:
+        return None
+    try:
+        return parse_expression(line[start + 1:end])
+    except ExpressionError:
+        return None
+
+def condition_tokens(tokens):
+    """Tokens between the parentheses of an if / else if line, [] if there are none"""
+    try:
+        return tokens[tokens.index("(") + 1:tokens.index(")")]
+    except ValueError:
+        return []
+
+def is_skipped(line):
+    """Blank lines, comments and annotations"""
+    return not line or line.startswith("#") or line.startswith("@")
+
+def build_block_index(lines):
+    """Match every block opening line to the lines that end its branches in one pass
+
+    Maps the index of each line that opens a block to the indexes of its "} else"
+    lines at the block's own depth followed by the index of the closing "}"
+    (or len(lines) if the block is never closed).
+    """
+    block_index = {}
+    open_blocks = []
+    for idx, line in enumerate(lines):
+        line = line.strip()
+        if is_skipped(line):
+            continue
+        if line.startswith("}") and open_blocks:
+            block_index[open_blocks[-1]].append(idx)
+            if not line.startswith("} else"):
+                open_blocks.pop()
+            continue
+        if line.count('{') > line.count('}'):
+            block_index[idx] = []
+            open_blocks.append(idx)
+    for idx in open_blocks:
+        block_index[idx].append(len(lines))
+    return block_index
+
+def collect_block(lines, start_idx, end_idx, block_index):
+    """Parse the body of the block opened on start_idx, returns (body, index after the block)"""
+    close_idx = min(block_index.get(start_idx, [start_idx])[-1], end_idx)
+    return parse_lines(lines, start_idx + 1, close_idx, block_index), close_idx + 1
+
+def parse_if_else_chain(lines, start_idx, end_idx, block_index):
+    """Parse an entire if-else-if-else chain, returns (IfChain, index after the chain)"""
+    branches = []
+    branch_idx = start_idx
+    condition = condition_tokens(tokenize(lines[start_idx].strip()))
+
+    for block_end in block_index.get(start_idx, [start_idx]):
+        block_end = min(block_end, end_idx)
+        line = lines[branch_idx].strip()
+        body = parse_lines(lines, branch_idx + 1, block_end, block_index)
+        if condition is not False:
+            branches.append(Branch(branch_idx + 1, line, condition, body))
+
+        if block_end >= end_idx:
+            return IfChain(start_idx + 1, lines[start_idx].strip(), branches), end_idx
+
+        line = lines[block_end].strip()
+        if not line.startswith("} else"):
+            break
+
+        # The next branch starts on this "} else" line
+        else_tokens = tokenize(line[1:].strip())
+        if len(else_tokens) > 1 and else_tokens[0] == "else" and else_tokens[1] == "if":
+            condition = condition_tokens(else_tokens)
+        elif else_tokens and else_tokens[0] == "else":
+            condition = None
+        else:
+            # Not a real else branch, its block never runs
+            condition = False
+        branch_idx = block_end
+
+    return IfChain(start_idx + 1, lines[start_idx].strip(), branches), block_end + 1
+
+def parse_lines(lines, start_idx=0, end_idx=None, block_index=None):
+    """Turn lines[start_idx:end_idx] into a list of statement nodes"""
+    if end_idx is None:
+        end_idx = len(lines)
+    if block_index is None:
+        block_index = build_block_index(lines)
+
+    nodes = []
+    # maxsize of a @memo line waiting for the function below it
+    memo = None
+    idx = start_idx
+    while idx < end_idx:
+        line = lines[idx].strip()
+
+        if line.startswith("@"):
+            match = MEMO_PATTERN.match(line)
+            if match:
+                memo = int(match.group(1) or 0)
+
+        # Comments, blank lines, annotations and stray closing braces
+        if is_skipped(line) or line.startswith("}"):
+            idx += 1
+            continue
+
+        tokens = tokenize(line)
+        if not tokens:
+            idx += 1
+            continue
+
+        command = tokens[0]
+        if command == "function" and len(tokens) >= 4 and tokens[2] == "(" and ")" in tokens and "{" in line:
+            params = [token for token in tokens[3:tokens.index(")")] if token != ","]
+            body, next_idx = collect_block(lines, idx, end_idx, block_index)
+            nodes.append(FunctionDef(idx + 1, line, tokens[1], params, body, memo))
+            idx = next_idx
+
+        elif command == "return":
+            value = parse_return(line)
+            if value is None:
+                # A malformed expression is left to builtin_return, which reports it
+                nodes.append(Statement(idx + 1, line, tokens))
+            else:
+                nodes.append(Return(idx + 1, line, value))
+            idx += 1
+
+        elif command == "if" and "then" in tokens and "{" in line:
+            chain, idx = parse_if_else_chain(lines, idx, end_idx, block_index)
+            nodes.append(chain)
+
+        elif command == "while" and "(" in tokens and "{" in line:
+            body, next_idx = collect_block(lines, idx, end_idx, block_index)
+            nodes.append(WhileLoop(idx + 1, line, condition_tokens(tokens), body))
+            idx = next_idx
+
+        elif command == "for" and len(tokens) >= 5 and tokens[2] == "in" and tokens[-1] == "{" and (tokens[3] == "range" or len(tokens) == 5):
+            range_args, source = None, None
+            if tokens[3] == "range":
+                range_args = [token for token in tokens[4:-1] if token not in ("(", ")")]
+            else:
+                source = tokens[3]
+            body, next_idx = collect_block(lines, idx, end_idx, block_index)
+            nodes.append(ForLoop(idx + 1, line, tokens[1], range_args, source, body))
+            idx = next_idx
+
+        elif command == "foreach" and FOREACH_PATTERN.match(line):
+            var, path = FOREACH_PATTERN.match(line).groups()
+            body, next_idx = collect_block(lines, idx, end_idx, block_index)
+            nodes.append(ForLoop(idx + 1, line, var, None, None, body, path))
+            idx = next_idx
+
+        elif command == "repeat" and len(tokens) >= 3 and tokens[-1] == "{":
+            range_args = [token for token in tokens[1:-1] if token not in ("(", ")")]
+            body, next_idx = collect_block(lines, idx, end_idx, block_index)
+            nodes.append(ForLoop(idx + 1, line, None, range_args, None, body))
+            idx = next_idx
+
+        else:
+            nodes.append(Statement(idx + 1, line, tokens))
+            idx += 1
+        # @memo only applies to the function right below it
+        memo = None
+
+    return nodes
+
+def parse_program(source):
+    """Parse the text of a .spk file into a list of statement nodes"""
+    return parse_lines(source.splitlines())
@@ -0,0 +1,227 @@
+"""
+What kind of value each token of a line stands for, worked out once per token.
+
+    let total = 5       NAME, NAME, NAME, INT
+    print "hi"          NAME, STRING
+    get ages[name]      NAME, INDEX
+    list xs = [1, 2]    NAME, NAME, NAME, LIST_LITERAL
+
+Commands get their tokens as strings and look operands up through get_val.
+Before, get_val tried every shape on every call: list literal, indexed name,
+number (converting it with int or float each time), variable, quoted string.
+token_type does that sniffing the first time it sees a token and keeps the
+kind and the converted value in TOKEN_TYPES, so every later lookup of the
+same token is one dict lookup. The tokenizer fills the table as lines are
+parsed, a program loaded from the parse cache fills it as it runs.
+
+List literals like [1, "two", [3, x]] are read by one left to right pass
+over regex matched pieces, so long inline tables take linear time. Lists
+nest, and quoted items can hold their own quote as \" or \'. The parsed
+form of each literal is kept, so a literal in a loop or a function that runs
+often is only read once. Each use gets its own copy, with any variable
+items looked up at that moment.
+"""
+import re
+
+INT = "INT"
+FLOAT = "FLOAT"
+STRING = "STRING"
+LIST_LITERAL = "LIST_LITERAL"
+NAME = "NAME"
+INDEX = "INDEX"
+
+# Most tokens kept in TOKEN_TYPES, so strings made while a script runs can't grow it forever
+MAX_TOKEN_TYPES = 1 << 16
+# Most list literals whose parsed form is kept
+MAX_LIST_LITERALS = 1 << 12
+
+# A quoted string in a list literal, which can hold its own quote as \" or \'
+QUOTED = r'"[^"\\]*(?:\\.[^"\\]*)*"|\'[^\'\\]*(?:\\.[^\'\\]*)*\''
+# A list literal with no list inside it, matched in one go
+FLAT_LIST = re.compile(rf'\[[^"\'\[\]]*(?:(?:{QUOTED})[^"\'\[\]]*)*\]')
+# A list of flat lists, like an inline table, also matched in one go
+TABLE = re.compile(rf'\[\s*(?:(?:{FLAT_LIST.pattern})\s*,\s*)*(?:(?:{FLAT_LIST.pattern})\s*)?\]')
+# One item of a flat list, up to the next comma that isn't in quotes
+FLAT_ITEM = re.compile(rf'(?:{QUOTED}|[^,"\']+)+')
+# Pieces of a list literal: flat lists inside it, quoted strings, brackets,
+# commas, the text in between, and a quote that is never closed
+LIST_PIECE = re.compile(rf'{FLAT_LIST.pattern}|{QUOTED}|[\[\],]|[^"\'\[\],]+|["\']')
+# \" \' and \\ inside a quoted list item
+ESCAPE = re.compile(r'\\(["\'\\])')
+
+# token -> (kind, value)
+TOKEN_TYPES = {}
+
+def is_number(token):
+    return token.lstrip('-').replace('.', '').isdigit()
+
+def is_quoted(token):
+    return len(token) >= 2 and token[0] == token[-1] and token[0] in ('"', "'")
+
+def classify_token(token):
+    """(kind, value) for a token
+
+    INT and FLOAT hold the number, STRING the text between the quotes, NAME
+    the token itself and INDEX (name, index token) for name[index]. A
+    LIST_LITERAL holds the token, its items can be variables so it is read
+    when used.
+    """
+    if token.startswith('[') and token.endswith(']'):
+        return (LIST_LITERAL, token)
+    if '[' in token and ']' in token and not token.startswith('['):
+        name, index = token.split('[', 1)
+        return (INDEX, (name, index[:-1]))
+    if is_number(token):
+        try:
+            return (FLOAT, float(token)) if '.' in token else (INT, int(token))
+        except ValueError:
+            # Looks like a number but isn't one, like 1.2.3
+            pass
+    if is_quoted(token):
+        return (STRING, token[1:-1])
+    return (NAME, token)
+
+def token_type(token):
+    """(kind, value) for a token, from TOKEN_TYPES after the first time"""
+    typed = TOKEN_TYPES.get(token)
+    if typed is None:
+        typed = classify_token(token)
+        if len(TOKEN_TYPES) < MAX_TOKEN_TYPES:
+            TOKEN_TYPES[token] = typed
+    return typed
+
+def number_value(text):
+    """text as an int or float if it is written as one, otherwise None
+
+    Strings that aren't tokens, like lines read from a file, are checked
+    without being kept in TOKEN_TYPES.
+    """
+    kind, value = TOKEN_TYPES.get(text) or classify_token(text)
+    if kind is INT or kind is FLOAT:
+        return value
+    return None
+
+class Name:
+    """A list item that is a variable, or its own text when there is no such variable"""
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+# list literal -> (items with Name for variables, True if it's a flat list of constants)
+LIST_LITERALS = {}
+
+def list_ends(text, start):
+    """{where a list literal opens: just past its ]} for every list in text from start on
+
+    One pass, so a line with many [ that are never closed still takes linear time.
+    """
+    ends = {}
+    opened = []
+    for match in LIST_PIECE.finditer(text, start):
+        piece = match.group()
+        if piece[0] == "[":
+            if len(piece) == 1:
+                opened.append(match.start())
+            else:
+                # A whole flat list
+                ends[match.start()] = match.end()
+        elif piece == "]" and opened:
+            ends[opened.pop()] = match.end()
+    return ends
+
+def literal_item(raw):
+    """What one item of a list literal stands for, None for an empty item"""
+    if not raw:
+        return None
+    first = raw[0]
+    if (first == '"' or first == "'") and raw[-1] == first and len(raw) >= 2:
+        text = raw[1:-1]
+        return ESCAPE.sub(r"\1", text) if "\\" in text else text
+    # Items aren't kept in TOKEN_TYPES, a big table would fill it
+    if is_number(raw):
+        try:
+            return float(raw) if '.' in raw else int(raw)
+        except ValueError:
+            pass
+    return Name(raw)
+
+def flat_items(content):
+    """The items of a flat list literal, content is the text between its brackets"""
+    if '"' in content or "'" in content:
+        raws = FLAT_ITEM.findall(content)
+    else:
+        # Without quotes every comma ends an item
+        raws = content.split(",")
+    items = [literal_item(raw.strip()) for raw in raws]
+    if None in items:
+        items = [item for item in items if item is not None]
+    return items
+
+def parse_list_literal(text):
+    """The items of a list literal like '[1, "a", [2, x]]', Name for every
+    item that may be a variable, or None if its brackets don't match"""
+    if FLAT_LIST.fullmatch(text):
+        return flat_items(text[1:-1])
+    if TABLE.fullmatch(text):
+        return [flat_items(row[1:-1]) for row in FLAT_LIST.findall(text, 1)]
+
+    stack = []
+    items = None
+    # The lists inside the item being read
+    pieces = []
+    start = 0
+    for match in LIST_PIECE.finditer(text):
+        piece = match.group()
+        if items is None:
+            if piece != "[" or match.start() != 0:
+                return None
+            items, start = [], match.end()
+        elif piece[0] == "[" and len(piece) > 1:
+            pieces.append(flat_items(piece[1:-1]))
+        elif piece == "[":
+            stack.append((items, pieces, start))
+            items, pieces, start = [], [], match.end()
+        elif piece == "," or piece == "]":
+            raw = text[start:match.start()].strip()
+            if len(pieces) == 1 and raw[0] == "[" and raw[-1] == "]":
+                # The item is a nested list
+                items.append(pieces[0])
+            else:
+                item = literal_item(raw)
+                if item is not None:
+                    items.append(item)
+            pieces, start = [], match.end()
+            if piece == "]":
+                if not stack:
+                    return items if match.end() == len(text) else None
+                finished = items
+                items, pieces, start = stack.pop()
+                pieces.append(finished)
+    return None
+
+def is_constant(items):
+    return all(type(item) is not Name and (type(item) is not list or is_constant(item)) for item in items)
+
+def build_list(items, variables):
+    """A fresh list from parsed items, variables looked up now"""
+    return [variables.get(item.name, item.name) if type(item) is Name
+            else build_list(item, variables) if type(item) is list
+            else item
+            for item in items]
+
+def list_value(text, variables):
+    """The list a list literal stands for, None if it isn't one"""
+    parsed = LIST_LITERALS.get(text)
+    if parsed is None:
+        items = parse_list_literal(text)
+        if items is None:
+            return None
+        flat = is_constant(items) and not any(type(item) is list for item in items)
+        parsed = (items, flat)
+        if len(LIST_LITERALS) < MAX_LIST_LITERALS:
+            LIST_LITERALS[text] = parsed
+    items, flat = parsed
+    if flat:
+        return items[:]
+    return build_list(items, variables)
@@ -0,0 +1,412 @@
+"""
+Turns a parsed Spoke program into Python source, for spoke.py --transpile.
+
+Every Spoke function becomes a def that takes its call frame and returns
+its return value, let, math, print, return and conditions become plain
+Python, and every other command becomes a call to its run function, found
+through the interpreter's find_command on every call like in the other
+modes. Variables stay where the interpreter keeps them: parameters in the
+call's Frame, everything else in the globals dict, so commands see and
+change the same variables they always do.
+
+The source is compiled with compile() and run against the interpreter.
+Transpiled.positions maps every generated line back to the .spk line it came
+from, so errors are reported on the Spoke line like the other modes do.
+"""
+import re
+from spokeParser import Statement, FunctionDef, IfChain, WhileLoop, ForLoop, Return
+from spokeTokens import NAME, INDEX, LIST_LITERAL, token_type
+from spokeExpr import (COMPARE_OPERATORS, EXPRESSION_FUNCTIONS, ExpressionError, compare_values, index_value,
+                       malformed_condition, parse_assignment, parse_math, to_number)
+from spokeTypes import SpokeSet
+from spokeFunctions import call_function, make_function
+from spokeVM import INLINE_COMMANDS, collect_function_names, never_overridden, print_sentence
+
+# compile() filename of generated code, used to find its frames in a traceback
+FILENAME = "<spoke transpiled>"
+INDENT = "    "
+# Characters of a Spoke function name that can't be in a Python one
+NOT_IDENTIFIER = re.compile(r"\W")
+
+class Transpiled:
+    """Generated source, its code object and where each line came from
+
+    positions[n] is (lineno, line, error_prefix, expression) for line n of
+    the source, or None for lines that can't fail. nodes holds the statement
+    nodes the source refers to as N[index].
+    """
+    __slots__ = ("source", "positions", "nodes", "commands", "code")
+
+    def __init__(self, source, positions, nodes, commands):
+        self.source = source
+        self.positions = positions
+        self.nodes = nodes
+        # Names of the commands called as cmd_<name>
+        self.commands = commands
+        self.code = compile(source, FILENAME, "exec")
+
+class Transpiler:
+    """Writes Python source for parsed statement nodes"""
+
+    def __init__(self, function_names, is_overridden=never_overridden):
+        # Commands that share a name with a Spoke function are never compiled natively
+        self.function_names = function_names
+        # The interpreter's is_overridden, whether a command file replaces a built-in command
+        self.is_overridden = is_overridden
+        self.nodes = []
+        self.commands = set()
+        # Finished defs, each a list of (text, position) lines
+        self.blocks = []
+        self.def_count = 0
+        # The def being written, the parameters of its Spoke function and the indent level
+        self.out = None
+        self.params = set()
+        self.depth = 0
+
+    def transpile(self, nodes, name="<spoke>"):
+        main = self.function_block("spk_main", (), nodes)
+        lines = [
+            (f"# Transpiled from {name} by spokeTranspile.py", None),
+            ("# Spoke variables live in g (the globals) and v (the running call's frame)", None),
+            ("", None),
+        ]
+        for block in self.blocks + [main]:
+            lines.extend(block)
+            lines.append(("", None))
+        source = "\n".join(text for text, _ in lines) + "\n"
+        # Line numbers of generated code start at 1
+        positions = [None] + [position for _, position in lines]
+        return Transpiled(source, positions, self.nodes, self.commands)
+
+    def function_block(self, name, params, body):
+        """def name(v): body, as a list of (text, position) lines"""
+        block = [(f"def {name}(v):", None)]
+        previous = (self.out, self.params, self.depth)
+        self.out, self.params, self.depth = block, set(params), 1
+        self.body(body)
+        self.out, self.params, self.depth = previous
+        return block
+
+    def emit(self, text, node=None, error_prefix=None, expression=False):
+        position = (node.lineno, node.line, error_prefix, expression) if node is not None else None
+        self.out.append((INDENT * self.depth + text, position))
+
+    def node_ref(self, node):
+        """N[index] for a node the generated code passes to the runtime"""
+        self.nodes.append(node)
+        return f"N[{len(self.nodes) - 1}]"
+
+    def body(self, nodes):
+        if not nodes:
+            self.emit("pass")
+        for node in nodes:
+            self.emit(f"# {node.lineno}: {node.line}")
+            self.statement(node)
+
+    def block(self, header, nodes, node):
+        self.emit(header, node)
+        self.depth += 1
+        self.body(nodes)
+        self.depth -= 1
+
+    def statement(self, node):
+        node_type = type(node)
+        if node_type is Statement:
+            self.command(node)
+        elif node_type is IfChain:
+            self.if_chain(node)
+        elif node_type is WhileLoop:
+            self.block(f"while {self.condition(node)}:", node.body, node)
+        elif node_type is ForLoop:
+            target = "_" if node.var is None else self.target(node.var)
+            self.block(f"for {target} in loop_values({self.node_ref(node)}):", node.body, node)
+        elif node_type is Return:
+            self.emit(f"return {self.expression(node.value)}", node)
+        elif node_type is FunctionDef:
+            self.def_count += 1
+            # Any name the parser accepts makes a valid def name, "a-b" gives spk__a_b__1
+            name = f"spk_{NOT_IDENTIFIER.sub('_', node.name)}_{self.def_count}"
+            block = self.function_block(name, node.params, node.body)
+            self.blocks.append([(f"# function {node.name}", None)] + block)
+            self.emit(f"define({name}, {self.node_ref(node)})", node)
+
+    def if_chain(self, chain):
+        keyword = "if"
+        for branch in chain.branches:
+            if branch.condition is None:
+                self.block("else:", branch.body, branch)
+                break
+            self.block(f"{keyword} {self.condition(branch)}:", branch.body, branch)
+            keyword = "elif"
+
+    def condition(self, node):
+        if node.test is None:
+            # Malformed, warns and counts as false when it runs
+            return f"malformed({self.node_ref(node)})"
+        return self.expression(node.test)
+
+    def command(self, node):
+        tokens = node.tokens
+        command = tokens[0]
+
+        if command in self.function_names:
+            if node.call_args is not None:
+                args = ", ".join(self.load(token) for token in node.call_args)
+                self.emit(f"call({command!r}, [{args}], {self.node_ref(node)})", node)
+            else:
+                self.emit(f"call_command({self.node_ref(node)})", node)
+        elif command in INLINE_COMMANDS and self.is_overridden(command):
+            self.emit(f"call_command({self.node_ref(node)})", node)
+        elif command == "let" and self.transpile_let(node):
+            pass
+        elif command == "math" and self.transpile_math(node):
+            pass
+        elif command == "print" and self.transpile_print(node):
+            pass
+        elif command.isidentifier():
+            self.commands.add(command)
+            self.emit(f"if not cmd_{command}({list(tokens)!r}, v, functions, get_val, errorLine, "
+                      f"{node.lineno}, {node.line!r}):", node, f"Error executing command {command}")
+            self.emit(f"{INDENT}errorLine({node.lineno}, {node.line!r})", node)
+        else:
+            self.emit(f"run_command({self.node_ref(node)})", node)
+
+    def transpile_let(self, node):
+        """let var = expression, mirroring builtin_let"""
+        try:
+            name, tree = parse_assignment(node.line)
+        except ExpressionError:
+            # Left to the command, which reports the error when the line runs
+            return False
+        self.emit(f"{self.target(name)} = {self.expression(tree)}", node, "Let operation error", True)
+        return True
+
+    def transpile_math(self, node):
+        """math expression [silent/loud] [var], mirroring builtin_math"""
+        try:
+            tree, loud, name = parse_math(node.line)
+        except ExpressionError:
+            return False
+        self.emit(f"value = {self.expression(tree)}", node, "Math error", True)
+        if loud:
+            self.emit("print(value)", node)
+        if name is not None:
+            self.emit(f"{self.target(name)} = value", node)
+        return True
+
+    def transpile_print(self, node):
+        """print var / print ( text ), mirroring builtin_print"""
+        tokens = node.tokens
+        if len(tokens) >= 3 and tokens[1] == "(" and tokens[-1] == ")":
+            self.emit(f"print({print_sentence(tokens[2:-1])!r})", node)
+        elif len(tokens) == 2:
+            self.emit(f"print_name(v, {tokens[1]!r}, {self.node_ref(node)})", node)
+        else:
+            return False
+        return True
+
+    def target(self, name):
+        """Where assigning to a Spoke variable goes"""
+        if name in self.params:
+            return f"v[{name!r}]"
+        return f"g[{name!r}]"
+
+    def lookup(self, name):
+        """Reading a Spoke variable, a name that isn't one stands for itself"""
+        if name in self.params:
+            return f"v[{name!r}]"
+        return f"g.get({name!r}, {name!r})"
+
+    def load(self, token):
+        """The value get_val would return for a call argument token"""
+        kind, value = token_type(token)
+        if kind is NAME and token.isidentifier():
+            return self.lookup(token)
+        if kind is NAME or kind is INDEX or kind is LIST_LITERAL:
+            return f"get_val({token!r})"
+        # Numbers and quoted strings
+        return repr(value)
+
+    def expression(self, tree):
+        """Python source for an expression tree from spokeExpr"""
+        kind = tree[0]
+        if kind == "const":
+            return repr(tree[1])
+        if kind == "name":
+            return self.lookup(tree[1])
+        if kind == "binary":
+            return f"({self.expression(tree[2])} {tree[1]} {self.expression(tree[3])})"
+        if kind == "compare":
+            _, op, left, right, negate = tree
+            right_source = repr(to_number(right[1])) if right[0] == "const" else self.expression(right)
+            comparison = f"compare({self.expression(left)}, {right_source}, {op!r})"
+            return f"(not {comparison})" if negate else comparison
+        if kind in ("and", "or"):
+            return f"({self.expression(tree[1])} {kind} {self.expression(tree[2])})"
+        if kind == "not":
+            return f"(not {self.expression(tree[1])})"
+        if kind == "neg":
+            return f"(-{self.expression(tree[1])})"
+        if kind == "call":
+            return f"{tree[1]}({', '.join(self.expression(arg) for arg in tree[2])})"
+        if kind == "function":
+            return f"call_function(functions, {tree[1]!r}, [{', '.join(self.expression(arg) for arg in tree[2])}])"
+        if kind == "index":
+            return f"index_value({self.expression(tree[1])}, {self.expression(tree[2])})"
+        if kind == "list":
+            return f"[{', '.join(self.expression(item) for item in tree[1])}]"
+        if kind == "map":
+            return "{" + ", ".join(f"{self.expression(key)}: {self.expression(value)}" for key, value in tree[1]) + "}"
+        if kind == "set":
+            return f"SpokeSet([{', '.join(self.expression(item) for item in tree[1])}])"
+        raise ExpressionError(f"unknown expression node {kind}")
+
+def transpile_program(nodes, name="<spoke>", is_overridden=never_overridden):
+    """Transpile a parsed program, name is only used in the header comment"""
+    return Transpiler(collect_function_names(nodes, set()), is_overridden).transpile(nodes, name)
+
+def compare(first, second, op):
+    """A comparison from a condition, numeric strings compare as numbers"""
+    if type(first) is str:
+        first = to_number(first)
+    if type(second) is str:
+        second = to_number(second)
+    return compare_values(first, second, op, COMPARE_OPERATORS[op])
+
+class Runtime:
+    """What transpiled code runs against: the interpreter's variables, functions and commands"""
+
+    def __init__(self, call_stack, functions, get_val, errorLine, run_command, find_command, loop_values,
+                 frame_type, profiler=None):
+        self.call_stack = call_stack
+        self.functions = functions
+        self.get_val = get_val
+        self.errorLine = errorLine
+        self.run_command = run_command
+        self.find_command = find_command
+        self.loop_values = loop_values
+        self.frame_type = frame_type
+        self.profiler = profiler
+        if profiler:
+            self.run_function = profiler.functions.wrap(self.run_function, lambda function, args: (function['name'], function['name']))
+
+    def namespace(self, transpiled):
+        """Globals for the generated code"""
+        namespace = dict(EXPRESSION_FUNCTIONS)
+        namespace.update({
+            "g": self.call_stack[0],
+            "N": transpiled.nodes,
+            "functions": self.functions,
+            "get_val": self.get_val,
+            "errorLine": self.errorLine,
+            "run_command": self.run_command,
+            "loop_values": self.loop_values,
+            "call": self.call,
+            "call_command": self.call_command,
+            "define": self.define,
+            "malformed": self.malformed,
+            "print_name": self.print_name,
+            "call_function": call_function,
+            "compare": compare,
+            "index_value": index_value,
+            "SpokeSet": SpokeSet,
+        })
+
+        for command in transpiled.commands:
+            self.bind_command(namespace, command)
+        return namespace
+
+    def bind_command(self, namespace, command):
+        """Make cmd_<command> find the command's run function on every call
+
+        Going through find_command each time, like run_command does, keeps
+        reloading edited command files and the command counts the same as in
+        the other modes.
+        """
+        find_command = self.find_command
+
+        def run(*args):
+            command_func = find_command(command)
+            if command_func is None:
+                command_func = unknown_command(command)
+            return command_func(*args)
+        if self.profiler:
+            run = self.profiler.commands.wrap(run, lambda *args: (command, command))
+        namespace[f"cmd_{command}"] = run
+
+    def run(self, transpiled):
+        """Run transpiled code, reporting Python errors on the .spk line they came from"""
+        namespace = self.namespace(transpiled)
+        try:
+            exec(transpiled.code, namespace)
+            namespace["spk_main"](self.call_stack[0])
+        except Exception as e:
+            self.report(e, transpiled)
+
+    def report(self, error, transpiled):
+        """Print an error the way the interpreter would for the same line, then stop"""
+        py_lineno = None
+        tb = error.__traceback__
+        while tb is not None:
+            if tb.tb_frame.f_code.co_filename == FILENAME:
+                py_lineno = tb.tb_lineno
+            tb = tb.tb_next
+        position = transpiled.positions[py_lineno] if py_lineno is not None else None
+        if position is None:
+            raise error
+
+        lineno, line, error_prefix, expression = position
+        if expression and isinstance(error, ZeroDivisionError):
+            print("Error: Division by zero")
+        elif error_prefix is not None:
+            print(f"{error_prefix}: {error}")
+        else:
+            print(f"DEBUG: Unexpected error on line {lineno}: {error}")
+        self.errorLine(lineno, line)
+
+    def call(self, name, args, node):
+        """Call a Spoke function, or run the line as a command if no such function exists yet"""
+        function = self.functions.get(name)
+        if function is None:
+            self.run_command(node)
+            return
+
+        if len(args) != len(function['params']):
+            self.errorLine(node.lineno, node.line)
+        function['call'](args)
+
+    def run_function(self, function, args):
+        """Run the def of a function defined by transpiled code, returns its return value"""
+        call_stack = self.call_stack
+        frame = self.frame_type(zip(function['params'], args), call_stack[0])
+        call_stack.append(frame)
+        try:
+            return function['py'](frame)
+        finally:
+            call_stack.pop()
+
+    def call_command(self, node):
+        """A function name without (args), or a command of the same name"""
+        if node.tokens[0] in self.functions:
+            self.errorLine(node.lineno, node.line)
+        self.run_command(node)
+
+    def define(self, py_function, node):
+        self.functions[node.name] = make_function(node, self.run_function, py=py_function)
+
+    def malformed(self, node):
+        return malformed_condition(node.lineno)
+
+    def print_name(self, variables, name, node):
+        if name in variables:
+            print(variables[name])
+        else:
+            print(f"Variable '{name}' not found")
+            self.errorLine(node.lineno, node.line)
+
+def unknown_command(command):
+    """Stands in for a command that isn't built in or in the commands folder"""
+    def run(tokens, variables, functions, get_val, errorLine, lineNum, line):
+        print(f"DEBUG: Unknown command '{command}' on line {lineNum}")
+        errorLine(lineNum, line)
+    return run